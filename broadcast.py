@@ -0,0 +1,457 @@
+import asyncio
+import logging
+import os
+import socket
+import threading
+import time
+from collections import namedtuple
+from aiogram.exceptions import (
+    TelegramBadRequest, TelegramForbiddenError, TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+)
+from cache import TTLCache
+from db import connect, transaction
+from metrics import BROADCAST_MESSAGES
+from scheduler import outbound_priority, NOTIFICATION
+from config import (
+    BROADCAST_PATH, BROADCAST_CHUNK, BROADCAST_CONCURRENCY, BROADCAST_LEASE,
+    BROADCAST_LOG_INTERVAL, SHUTDOWN_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+# cursor - последний обработанный user_id: получатели читаются по возрастанию id,
+# поэтому после перезапуска рассылка продолжается с места остановки.
+# owner и heartbeat - аренда: рассылку ведет один процесс
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recipients (
+    user_id INTEGER PRIMARY KEY,
+    added_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS broadcasts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    text TEXT NOT NULL,
+    status TEXT NOT NULL,
+    cursor INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL,
+    sent INTEGER NOT NULL DEFAULT 0,
+    blocked INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    owner TEXT,
+    heartbeat REAL,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+"""
+
+Broadcast = namedtuple(
+    "Broadcast", ["id", "text", "status", "cursor", "total", "sent", "blocked", "failed", "created_at", "finished_at"]
+)
+BROADCAST_COLUMNS = ", ".join(Broadcast._fields)
+
+# Недавно записанные получатели, чтобы не писать в базу на каждый апдейт
+RECIPIENT_CACHE_SIZE = 10000
+RECIPIENT_CACHE_TTL = 3600
+# Как часто записывать новых получателей и проверять, нет ли рассылки без владельца
+MAINTENANCE_INTERVAL = 1
+
+# Результат отправки одному получателю; RETRY - временная ошибка (429 после
+# повторов планировщика, сеть, 5xx), получатель не пропускается
+SENT, BLOCKED, FAILED, RETRY = "sent", "blocked", "failed", "retry"
+
+# Ответы 400, после которых писать получателю бесполезно
+GONE_ERRORS = ("chat not found", "user is deactivated", "peer_id_invalid")
+
+# Пауза рассылки после временной ошибки: удваивается, пока ошибки повторяются
+RETRY_DELAY = 5
+MAX_RETRY_DELAY = 300
+
+STATUS_NAMES = {"running": "идет", "done": "завершена", "cancelled": "остановлена"}
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600} ч {seconds % 3600 // 60} мин"
+    if seconds >= 60:
+        return f"{seconds // 60} мин {seconds % 60} с"
+    return f"{seconds} с"
+
+class Broadcaster:
+    """Рассылка сообщения всем пользователям бота.
+
+    Получатели - пользователи личных чатов (их запоминает RecipientMiddleware).
+    Рассылка читает их из SQLite пачками по chunk, отправляет через планировщик
+    с приоритетом уведомлений (скорость ограничивает OUTBOUND_GLOBAL_RATE,
+    ответы пользователям идут вперед) и после каждой пачки сохраняет позицию.
+    После падения рассылка продолжается с сохраненной позиции, повторно
+    сообщение получат не больше chunk пользователей. Заблокировавшие бота
+    удаляются из получателей.
+
+    При временных ошибках (429, сеть, 5xx) рассылка встает на паузу и
+    повторяет недоставленные сообщения пачки; позиция сохраняется, только
+    когда каждому получателю пачки сообщение доставлено или не может быть
+    доставлено никогда.
+
+    Рассылку ведет процесс, который держит аренду; если он пропал, через
+    lease секунд рассылку подхватывает другой процесс или перезапущенный бот.
+    """
+
+    def __init__(self, bot, path=BROADCAST_PATH, chunk=BROADCAST_CHUNK, concurrency=BROADCAST_CONCURRENCY,
+                 lease=BROADCAST_LEASE, log_interval=BROADCAST_LOG_INTERVAL):
+        self.bot = bot
+        self.path = path
+        self.chunk = chunk
+        self.concurrency = concurrency
+        self.lease = lease
+        self.log_interval = log_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._connection = None
+        self._lock = threading.Lock()
+        self._known = TTLCache(RECIPIENT_CACHE_SIZE, RECIPIENT_CACHE_TTL)
+        self._new = set()
+        self._maintainer = None
+        self._task = None
+        self._stopping = asyncio.Event()
+        # Рассылка, которую ведет этот процесс, и ее скорость с момента подхвата
+        self.current = None
+        self._run_started = 0.0
+        self._run_processed = 0
+        # До какого времени (time.monotonic) рассылка стоит на паузе после временной ошибки
+        self._paused_until = 0.0
+
+    def _get_connection(self):
+        if self._connection is None:
+            self._connection = connect(self.path, SCHEMA)
+        return self._connection
+
+    def _transaction(self, work):
+        with self._lock, transaction(self._get_connection()) as connection:
+            return work(connection)
+
+    # Получатели
+
+    def add_recipient(self, user_id):
+        """Запоминает получателя; в базу новые получатели попадают пачкой"""
+        if user_id in self._known:
+            return
+        self._known.put(user_id, True)
+        self._new.add(user_id)
+
+    def _write_recipients(self, user_ids):
+        now = time.time()
+        self._transaction(lambda connection: connection.executemany(
+            "INSERT OR IGNORE INTO recipients (user_id, added_at) VALUES (?, ?)",
+            [(user_id, now) for user_id in user_ids]
+        ))
+
+    async def _flush_recipients(self):
+        if not self._new:
+            return
+        batch, self._new = self._new, set()
+        try:
+            await asyncio.to_thread(self._write_recipients, batch)
+        except Exception as e:
+            logger.error(f"Ошибка записи получателей в {self.path}: {e}")
+            self._new |= batch
+
+    def _next_chunk(self, cursor):
+        with self._lock:
+            return [
+                user_id for user_id, in self._get_connection().execute(
+                    "SELECT user_id FROM recipients WHERE user_id > ? ORDER BY user_id LIMIT ?",
+                    (cursor, self.chunk)
+                )
+            ]
+
+    # Рассылки и аренда
+
+    def _create(self, text):
+        def create(connection):
+            if connection.execute("SELECT 1 FROM broadcasts WHERE status = 'running'").fetchone():
+                return None
+            total, = connection.execute("SELECT COUNT(*) FROM recipients").fetchone()
+            return connection.execute(
+                "INSERT INTO broadcasts (text, status, total, created_at) VALUES (?, 'running', ?, ?)",
+                (text, total, time.time())
+            ).lastrowid
+        return self._transaction(create)
+
+    def _claim(self):
+        now = time.time()
+
+        def claim(connection):
+            row = connection.execute(
+                f"SELECT {BROADCAST_COLUMNS} FROM broadcasts WHERE status = 'running' "
+                "AND (owner IS NULL OR owner = ? OR heartbeat < ?) ORDER BY id LIMIT 1",
+                (self.owner, now - self.lease)
+            ).fetchone()
+            if row is not None:
+                connection.execute(
+                    "UPDATE broadcasts SET owner = ?, heartbeat = ? WHERE id = ?", (self.owner, now, row[0])
+                )
+            return row
+        row = self._transaction(claim)
+        return None if row is None else Broadcast(*row)
+
+    def _heartbeat(self, broadcast_id):
+        """Продлевает аренду; False, если рассылку остановили или она перешла другому процессу"""
+        with self._lock:
+            return self._get_connection().execute(
+                "UPDATE broadcasts SET heartbeat = ? WHERE id = ? AND status = 'running' AND owner = ?",
+                (time.time(), broadcast_id, self.owner)
+            ).rowcount > 0
+
+    def _checkpoint(self, broadcast_id, cursor, counts, gone):
+        def checkpoint(connection):
+            updated = connection.execute(
+                "UPDATE broadcasts SET cursor = ?, sent = sent + ?, blocked = blocked + ?, failed = failed + ?, "
+                "heartbeat = ? WHERE id = ? AND status = 'running' AND owner = ?",
+                (cursor, counts[SENT], counts[BLOCKED], counts[FAILED], time.time(), broadcast_id, self.owner)
+            ).rowcount
+            if updated and gone:
+                connection.executemany("DELETE FROM recipients WHERE user_id = ?", [(user_id,) for user_id in gone])
+            return bool(updated)
+        return self._transaction(checkpoint)
+
+    def _finish(self, broadcast_id, status):
+        with self._lock:
+            self._get_connection().execute(
+                "UPDATE broadcasts SET status = ?, finished_at = ?, owner = NULL "
+                "WHERE id = ? AND status = 'running' AND owner = ?",
+                (status, time.time(), broadcast_id, self.owner)
+            )
+
+    def _release(self, broadcast_id):
+        with self._lock:
+            self._get_connection().execute(
+                "UPDATE broadcasts SET owner = NULL WHERE id = ? AND owner = ?", (broadcast_id, self.owner)
+            )
+
+    def _cancel(self):
+        with self._lock:
+            return self._get_connection().execute(
+                "UPDATE broadcasts SET status = 'cancelled', finished_at = ?, owner = NULL WHERE status = 'running'",
+                (time.time(),)
+            ).rowcount > 0
+
+    def _latest(self):
+        with self._lock:
+            row = self._get_connection().execute(
+                f"SELECT {BROADCAST_COLUMNS} FROM broadcasts ORDER BY id DESC LIMIT 1"
+            ).fetchone()
+        return None if row is None else Broadcast(*row)
+
+    # Отправка
+
+    async def _send(self, user_id, text, semaphore, outage):
+        """Результат отправки; outage - первая временная ошибка в пачке.
+
+        После временной ошибки остальные сообщения пачки не отправляются
+        (RETRY без запроса): Bot API недоступен, их повторят после паузы.
+        """
+        async with semaphore:
+            if outage:
+                return RETRY
+            try:
+                with outbound_priority(NOTIFICATION):
+                    await self.bot.send_message(chat_id=user_id, text=text)
+                result = SENT
+            except TelegramForbiddenError:
+                result = BLOCKED
+            except TelegramBadRequest as e:
+                result = BLOCKED if any(error in e.message.lower() for error in GONE_ERRORS) else FAILED
+                if result == FAILED:
+                    logger.warning(f"📣 Не доставлено пользователю {user_id}: {e.message}")
+            except (TelegramRetryAfter, TelegramNetworkError, TelegramServerError) as e:
+                if not outage:
+                    outage.append(e)
+                result = RETRY
+            except Exception as e:
+                logger.warning(f"📣 Не доставлено пользователю {user_id}: {e}")
+                result = FAILED
+        BROADCAST_MESSAGES.inc(result)
+        return result
+
+    async def _send_chunk(self, broadcast, user_ids, semaphore):
+        """Отправляет пачку, пережидая временные ошибки; None, если рассылку остановили"""
+        results = dict.fromkeys(user_ids)
+        pending = user_ids
+        delay = RETRY_DELAY
+        while True:
+            outage = []
+            sent = await asyncio.gather(*(self._send(user_id, broadcast.text, semaphore, outage) for user_id in pending))
+            results.update(zip(pending, sent))
+            pending = [user_id for user_id in pending if results[user_id] == RETRY]
+            if not pending:
+                return results
+
+            error = outage[0]
+            pause = max(delay, getattr(error, "retry_after", 0))
+            delay = min(delay * 2, MAX_RETRY_DELAY)
+            logger.warning(
+                f"📣 Рассылка #{broadcast.id}: не отправлено {len(pending)} из {len(user_ids)} "
+                f"сообщений пачки ({type(error).__name__}: {error}), пауза {format_duration(pause)}"
+            )
+            self._paused_until = time.monotonic() + pause
+            try:
+                await asyncio.wait_for(self._stopping.wait(), pause)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self._paused_until = 0.0
+            # Аренду продлеваем здесь же: остановку через /broadcast stop видно, не дожидаясь конца пачки
+            if self._stopping.is_set() or not await asyncio.to_thread(self._heartbeat, broadcast.id):
+                return None
+
+    def _start_run(self, broadcast):
+        if self._task is not None and not self._task.done():
+            return
+        self.current = broadcast
+        self._run_started = time.monotonic()
+        self._run_processed = 0
+        self._task = asyncio.create_task(self._run(broadcast), name=f"broadcast-{broadcast.id}")
+
+    async def _run(self, broadcast):
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        cursor = broadcast.cursor
+        counts = {SENT: broadcast.sent, BLOCKED: broadcast.blocked, FAILED: broadcast.failed}
+        action = "продолжается" if cursor else "начата"
+        logger.info(f"📣 Рассылка #{broadcast.id} {action}: получателей {broadcast.total}")
+        last_log = loop.time()
+        try:
+            while not self._stopping.is_set():
+                user_ids = await asyncio.to_thread(self._next_chunk, cursor)
+                if not user_ids:
+                    await asyncio.to_thread(self._finish, broadcast.id, "done")
+                    logger.info(
+                        f"📣 Рассылка #{broadcast.id} завершена: доставлено {counts[SENT]}, "
+                        f"заблокировали бота {counts[BLOCKED]}, ошибок {counts[FAILED]}"
+                    )
+                    return
+
+                results = await self._send_chunk(broadcast, user_ids, semaphore)
+                if results is None:
+                    # Позиция не сохранена: пачку повторят после подхвата рассылки
+                    logger.info(f"📣 Рассылка #{broadcast.id} остановлена или передана другому процессу")
+                    return
+                results = list(results.values())
+                chunk_counts = {result: results.count(result) for result in (SENT, BLOCKED, FAILED)}
+                gone = [user_id for user_id, result in zip(user_ids, results) if result == BLOCKED]
+                if not await asyncio.to_thread(self._checkpoint, broadcast.id, user_ids[-1], chunk_counts, gone):
+                    logger.info(f"📣 Рассылка #{broadcast.id} остановлена или передана другому процессу")
+                    return
+                for user_id in gone:
+                    self._known.pop(user_id)
+
+                cursor = user_ids[-1]
+                for result, count in chunk_counts.items():
+                    counts[result] += count
+                self._run_processed += len(user_ids)
+                self.current = broadcast._replace(cursor=cursor, **counts)
+
+                if loop.time() - last_log >= self.log_interval:
+                    last_log = loop.time()
+                    logger.info(self.progress_text(self.current))
+        except Exception as e:
+            logger.error(f"💥 Ошибка рассылки #{broadcast.id}: {e}, повторим позже")
+        finally:
+            self.current = None
+            # Незавершенную рассылку сразу может подхватить другой процесс
+            await asyncio.to_thread(self._release, broadcast.id)
+
+    # Управление
+
+    def start(self):
+        """Запускает запись получателей и подхват незавершенных рассылок"""
+        self._maintainer = asyncio.create_task(self._maintain(), name="broadcast-maintenance")
+
+    async def _maintain(self):
+        last_claim = 0.0
+        while True:
+            await asyncio.sleep(MAINTENANCE_INTERVAL)
+            try:
+                await self._flush_recipients()
+                now = time.monotonic()
+                if now - last_claim < self.lease / 3:
+                    continue
+                last_claim = now
+                current = self.current
+                if current is not None:
+                    await asyncio.to_thread(self._heartbeat, current.id)
+                elif not self._stopping.is_set():
+                    broadcast = await asyncio.to_thread(self._claim)
+                    if broadcast is not None:
+                        self._start_run(broadcast)
+            except Exception as e:
+                logger.error(f"Ошибка обслуживания рассылок: {e}")
+
+    async def create(self, text):
+        """Начинает рассылку; None, если предыдущая еще идет"""
+        await self._flush_recipients()
+        broadcast_id = await asyncio.to_thread(self._create, text)
+        if broadcast_id is None:
+            return None
+        if self._task is None or self._task.done():
+            broadcast = await asyncio.to_thread(self._claim)
+            if broadcast is not None:
+                self._start_run(broadcast)
+        return broadcast_id
+
+    async def cancel(self):
+        """Останавливает идущую рассылку (процесс-владелец заметит это после текущей пачки)"""
+        return await asyncio.to_thread(self._cancel)
+
+    def progress_text(self, broadcast):
+        """Прогресс рассылки; скорость и оставшееся время - если ее ведет этот процесс"""
+        processed = broadcast.sent + broadcast.blocked + broadcast.failed
+        total = max(broadcast.total, processed)
+        percent = processed * 100 / total if total else 100
+        text = (
+            f"📣 Рассылка #{broadcast.id} ({STATUS_NAMES.get(broadcast.status, broadcast.status)}): "
+            f"{processed}/{total} ({percent:.1f}%), доставлено {broadcast.sent}, "
+            f"заблокировали бота {broadcast.blocked}, ошибок {broadcast.failed}"
+        )
+        now = time.monotonic()
+        elapsed = now - self._run_started
+        running_here = self.current is not None and self.current.id == broadcast.id
+        if running_here and self._paused_until > now:
+            text += f", пауза из-за ошибок Bot API еще {format_duration(self._paused_until - now)}"
+        elif running_here and self._run_processed and elapsed > 0:
+            rate = self._run_processed / elapsed
+            text += f", {rate:.1f} сообщ/с, осталось ~{format_duration((total - processed) / rate)}"
+        elif broadcast.finished_at:
+            text += f", за {format_duration(broadcast.finished_at - broadcast.created_at)}"
+        return text
+
+    async def status_text(self):
+        """Прогресс последней рассылки для /broadcast"""
+        if self.current is not None:
+            return self.progress_text(self.current)
+        broadcast = await asyncio.to_thread(self._latest)
+        if broadcast is None:
+            return "📣 Рассылок еще не было"
+        return self.progress_text(broadcast)
+
+    async def stop(self, timeout=SHUTDOWN_TIMEOUT):
+        """Останавливает рассылку после текущей пачки и освобождает аренду для другого процесса"""
+        self._stopping.set()
+        task = self._task
+        if task is None or task.done():
+            return
+        done, _ = await asyncio.wait({task}, timeout=timeout)
+        if not done:
+            # Позиция сохранена после предыдущей пачки, ее получатели получат сообщение повторно
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def close(self):
+        """Записывает накопленных получателей и закрывает базу"""
+        if self._maintainer is not None:
+            self._maintainer.cancel()
+            await asyncio.gather(self._maintainer, return_exceptions=True)
+            self._maintainer = None
+        await self._flush_recipients()
+        if self._connection is not None:
+            with self._lock:
+                self._connection.close()
+                self._connection = None
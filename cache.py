@@ -0,0 +1,75 @@
+import time
+from collections import OrderedDict
+
+class LRUCache:
+    """Словарь ограниченного размера с вытеснением давно не использованных ключей"""
+    __slots__ = ("maxsize", "hits", "misses", "_data")
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        """Значение по ключу (ключ становится самым свежим)"""
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """Сохраняет значение, вытесняя самый старый ключ при переполнении"""
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        self._data.clear()
+
+class TTLCache(LRUCache):
+    """LRU кэш, в котором значения устаревают через ttl секунд после записи"""
+    __slots__ = ("ttl",)
+
+    def __init__(self, maxsize, ttl):
+        super().__init__(maxsize)
+        self.ttl = ttl
+
+    def get(self, key, default=None):
+        """Значение по ключу, если оно еще не устарело"""
+        try:
+            expires, value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        if expires < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """Сохраняет значение со сроком жизни ttl"""
+        super().put(key, (time.monotonic() + self.ttl, value))
+
+    def pop(self, key, default=None):
+        """Удаляет ключ и возвращает значение"""
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def __contains__(self, key):
+        entry = self._data.get(key)
+        return entry is not None and entry[0] >= time.monotonic()
@@ -0,0 +1,125 @@
+import logging
+import re
+from catalog import get_catalog
+from config import STARS_PACKAGES
+
+logger = logging.getLogger(__name__)
+
+# Формат callback_data: версия, код экрана и целые аргументы в base36 через точку,
+# например "1n1a" - нейросеть с id 46, "1c3.1.2" - категория 3, сортировка 1, страница 2.
+# id категорий и нейросетей - постоянные номера из catalog.json, а не позиции:
+# кнопки в отправленных сообщениях остаются верными после перезагрузки каталога
+VERSION = "1"
+SEPARATOR = "."
+# Аргументы - только то, что выдает encode: int(..., 36) принял бы и "-1", "+1", "_" и пробелы
+ARGS_PATTERN = re.compile(r"[0-9a-z]+(?:\.[0-9a-z]+)*")
+
+# Экран -> однобуквенный код
+CODES = {
+    "main_menu": "m",
+    "category": "c",
+    "network": "n",
+    "help": "h",
+    "about": "a",
+    "updates": "u",
+    "support": "s",
+    "support_package": "p",
+}
+_names = {code: name for name, code in CODES.items()}
+
+# Экран -> (обработчик, минимум и максимум аргументов):
+# один поиск в словаре вместо перебора фильтров
+_routes = {}
+
+# Коды сортировок и пакетов передаются номером. Номер сортировки - позиция
+# в SORT_CODES, поэтому коды только добавляются в конец. "p" (популярные) убрана:
+# старые кнопки с ней открывают сортировку по умолчанию
+SORT_CODES = ("p", "n", "f")
+PACKAGE_IDS = tuple(STARS_PACKAGES)
+
+def _base36(number):
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    if number == 0:
+        return "0"
+    encoded = ""
+    while number:
+        number, remainder = divmod(number, 36)
+        encoded = digits[remainder] + encoded
+    return encoded
+
+def encode(screen, *args):
+    """Собирает callback_data для экрана с целыми аргументами"""
+    return VERSION + CODES[screen] + SEPARATOR.join(_base36(arg) for arg in args)
+
+def decode(data):
+    """Разбирает callback_data в (экран, аргументы) или None"""
+    if not data:
+        return None
+    if data[0] != VERSION:
+        return _decode_legacy(data)
+
+    name = _names.get(data[1:2])
+    if name is None:
+        return None
+    if len(data) == 2:
+        return name, ()
+    if ARGS_PATTERN.fullmatch(data, 2) is None:
+        return None
+    return name, tuple(int(arg, 36) for arg in data[2:].split(SEPARATOR))
+
+def _decode_legacy(data):
+    """Старый текстовый формат из уже отправленных сообщений"""
+    parts = data.split(":")
+    catalog = get_catalog()
+
+    if len(parts) == 1 and parts[0] in CODES:
+        return parts[0], ()
+
+    if parts[0] == "category" and len(parts) in (2, 4):
+        category = catalog.category(parts[1])
+        if category is None:
+            return None
+        if len(parts) == 4 and parts[2] in SORT_CODES and parts[3].isdecimal():
+            return "category", (category.id, SORT_CODES.index(parts[2]), int(parts[3]))
+        return "category", (category.id,)
+
+    if parts[0] == "network" and len(parts) == 3:
+        network = catalog.network(parts[1], parts[2])
+        return ("network", (network.id,)) if network is not None else None
+
+    if parts[0] == "support" and len(parts) == 2 and parts[1] in PACKAGE_IDS:
+        return "support_package", (PACKAGE_IDS.index(parts[1]),)
+
+    return None
+
+def callback_route(screen, args=0, optional=0):
+    """Декоратор: регистрирует обработчик экрана в таблице маршрутов.
+
+    Обработчик получает callback и от args до args + optional целых аргументов.
+    """
+    def register(handler):
+        _routes[screen] = (handler, args, args + optional)
+        return handler
+    return register
+
+def resolve(data):
+    """Обработчик и аргументы для callback_data или None"""
+    decoded = decode(data)
+    if decoded is None:
+        return None
+    name, args = decoded
+    route = _routes.get(name)
+    if route is None:
+        return None
+    handler, min_args, max_args = route
+    if not min_args <= len(args) <= max_args:
+        return None
+    return handler, args
+
+async def route_filter(callback):
+    """Фильтр общего обработчика кнопок: результат resolve попадает в data["route"].
+
+    callback_data разбирается один раз, а inner middleware еще до вызова
+    обработчика видят, какой конечный обработчик будет выполнен.
+    """
+    return {"route": resolve(callback.data)}
@@ -0,0 +1,274 @@
+import asyncio
+import logging
+import os
+import sys
+import time
+from data import load_neural_networks
+from config import CATALOG_PATH, CATALOG_RELOAD_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# Поля карточки нейросети, которые зависят от категории
+CARD_FIELDS = ("description", "free_features", "limitations", "pricing")
+
+# Порядки сортировки нейросетей в категории: код -> (название, ключ сортировки).
+# Номера сортировок в callback_data задает callbacks.SORT_CODES
+SORT_ORDERS = {
+    "f": ("🆓 Бесплатные", lambda network: (not network.free_tier, network.index)),
+    "n": ("🔤 По названию", lambda network: (network.name.casefold(), network.index)),
+}
+DEFAULT_SORT = "f"
+
+# Текущий каталог (строится при первом обращении, заменяется целиком)
+_catalog = None
+
+# Производные индексы: имя -> функция построения от каталога
+_index_builders = {}
+
+# Не даем двум перезагрузкам идти одновременно
+_reload_lock = asyncio.Lock()
+
+class Service:
+    """Сервис (нейросеть), единый для всех категорий, где он встречается"""
+    __slots__ = ("id", "key", "name", "url", "category_ids")
+
+    def __init__(self, id, key, name, url):
+        self.id = id
+        self.key = key
+        self.name = name
+        self.url = url
+        self.category_ids = ()
+
+    def __repr__(self):
+        return f"Service({self.id}, {self.key!r})"
+
+class Network:
+    """Карточка нейросети в конкретной категории.
+
+    id - постоянный номер из файла каталога (он попадает в callback_data),
+    index - позиция в catalog.networks, меняется при перестройке каталога.
+    """
+    __slots__ = ("id", "index", "key", "category_id", "category_key", "service",
+                 "description", "free_features", "limitations", "pricing", "free_tier")
+
+    def __init__(self, id, index, key, category_id, category_key, service,
+                 description, free_features, limitations, pricing, free_tier=False):
+        self.id = id
+        self.index = index
+        self.key = key
+        self.category_id = category_id
+        self.category_key = category_key
+        self.service = service
+        self.description = description
+        self.free_features = free_features
+        self.limitations = limitations
+        self.pricing = pricing
+        self.free_tier = free_tier
+
+    @property
+    def name(self):
+        return self.service.name
+
+    @property
+    def url(self):
+        return self.service.url
+
+    def __repr__(self):
+        return f"Network({self.id}, {self.key!r})"
+
+class Category:
+    """Категория нейросетей (id и index - как у Network)"""
+    __slots__ = ("id", "index", "key", "name", "description", "networks", "orders", "_by_key")
+
+    def __init__(self, id, index, key, name, description):
+        self.id = id
+        self.index = index
+        self.key = key
+        self.name = name
+        self.description = description
+        self.networks = ()
+        # Код сортировки -> нейросети категории в этом порядке
+        self.orders = {}
+        self._by_key = {}
+
+    def network(self, network_key):
+        """Нейросеть категории по строковому ключу"""
+        return self._by_key.get(network_key)
+
+    def __repr__(self):
+        return f"Category({self.id}, {self.key!r})"
+
+class Catalog:
+    """Каталог с индексами по постоянным id и строковым ключам"""
+    __slots__ = ("categories", "networks", "services", "indexes", "mtime",
+                 "_categories_by_key", "_services_by_key", "_categories_by_id", "_networks_by_id")
+
+    def __init__(self, categories, networks, services):
+        self.categories = categories
+        self.networks = networks
+        self.services = services
+        self.indexes = {}
+        self.mtime = None
+        self._categories_by_key = {category.key: category for category in categories}
+        self._services_by_key = {service.key: service for service in services}
+        self._categories_by_id = {category.id: category for category in categories}
+        self._networks_by_id = {network.id: network for network in networks}
+
+    def category(self, category_key):
+        """Категория по строковому ключу"""
+        return self._categories_by_key.get(category_key)
+
+    def network(self, category_key, network_key):
+        """Нейросеть по ключам категории и нейросети"""
+        category = self._categories_by_key.get(category_key)
+        if category is None:
+            return None
+        return category.network(network_key)
+
+    def category_by_id(self, category_id):
+        """Категория по постоянному id или None"""
+        return self._categories_by_id.get(category_id)
+
+    def network_by_id(self, network_id):
+        """Нейросеть по постоянному id или None"""
+        return self._networks_by_id.get(network_id)
+
+    def service(self, service_key):
+        """Сервис по строковому ключу"""
+        return self._services_by_key.get(service_key)
+
+    def categories_of(self, service_key):
+        """Категории, в которых встречается сервис"""
+        service = self._services_by_key.get(service_key)
+        if service is None:
+            return ()
+        return tuple(self._categories_by_id[category_id] for category_id in service.category_ids)
+
+def build_catalog(neural_networks):
+    """Строит компактный каталог из вложенного словаря NEURAL_NETWORKS"""
+    intern = sys.intern
+    strings = {}
+
+    def share(value):
+        # Повторяющиеся тексты (цены, описания) храним в одном экземпляре
+        return strings.setdefault(value, value)
+
+    categories = []
+    networks = []
+    services = []
+    services_by_key = {}
+    service_categories = {}
+
+    for category_key, category_data in neural_networks.items():
+        category = Category(
+            category_data['id'],
+            len(categories),
+            intern(category_key),
+            share(category_data['name']),
+            share(category_data['description'])
+        )
+        categories.append(category)
+
+        category_networks = []
+        for network_key, network_data in category_data['networks'].items():
+            network_key = intern(network_key)
+
+            service = services_by_key.get(network_key)
+            if service is None:
+                service = Service(
+                    len(services),
+                    network_key,
+                    share(network_data['name']),
+                    intern(network_data['url'])
+                )
+                services.append(service)
+                services_by_key[network_key] = service
+                service_categories[network_key] = []
+            service_categories[network_key].append(category.id)
+
+            network = Network(
+                network_data['id'],
+                len(networks),
+                network_key,
+                category.id,
+                category.key,
+                service,
+                *(share(network_data[field]) for field in CARD_FIELDS),
+                free_tier=network_data.get('free_tier', network_data['pricing'].startswith("🆓"))
+            )
+            networks.append(network)
+            category_networks.append(network)
+
+        category.networks = tuple(category_networks)
+        category.orders = {
+            sort: tuple(sorted(category_networks, key=sort_key))
+            for sort, (_, sort_key) in SORT_ORDERS.items()
+        }
+        category._by_key = {network.key: network for network in category_networks}
+
+    for service in services:
+        service.category_ids = tuple(service_categories[service.key])
+
+    catalog = Catalog(tuple(categories), tuple(networks), tuple(services))
+
+    # Производные индексы строятся до публикации каталога
+    for name, builder in _index_builders.items():
+        catalog.indexes[name] = builder(catalog)
+
+    return catalog
+
+def register_index(name, builder):
+    """Регистрирует производный индекс, который строится вместе с каталогом"""
+    _index_builders[name] = builder
+    if _catalog is not None:
+        _catalog.indexes[name] = builder(_catalog)
+
+def load_catalog(path=CATALOG_PATH):
+    """Читает файл каталога и строит каталог со всеми индексами"""
+    mtime = os.stat(path).st_mtime_ns
+    catalog = build_catalog(load_neural_networks(path))
+    catalog.mtime = mtime
+    return catalog
+
+def get_catalog():
+    """Возвращает текущий каталог"""
+    global _catalog
+    if _catalog is None:
+        _catalog = load_catalog()
+    return _catalog
+
+async def reload_catalog(path=CATALOG_PATH):
+    """Перестраивает каталог в фоновом потоке и атомарно подменяет текущий"""
+    global _catalog
+    async with _reload_lock:
+        started = time.perf_counter()
+        try:
+            catalog = await asyncio.to_thread(load_catalog, path)
+        except Exception as e:
+            logger.error(f"Не удалось перезагрузить каталог, остается старый: {e}")
+            return False
+
+        # Одно присваивание: обработчики видят либо старый, либо новый каталог
+        _catalog = catalog
+        logger.info(
+            f"📚 Каталог перезагружен: {len(catalog.categories)} категорий, "
+            f"{len(catalog.networks)} нейросетей за {(time.perf_counter() - started) * 1000:.1f} мс"
+        )
+        return True
+
+async def watch_catalog(path=CATALOG_PATH, interval=CATALOG_RELOAD_INTERVAL):
+    """Следит за временем изменения файла каталога и перезагружает его"""
+    # Время изменения, для которого уже была попытка загрузки
+    seen_mtime = get_catalog().mtime
+
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError as e:
+            logger.warning(f"Файл каталога недоступен: {e}")
+            continue
+
+        if mtime != seen_mtime and mtime != get_catalog().mtime:
+            seen_mtime = mtime
+            await reload_catalog(path)
@@ -0,0 +1,158 @@
+import json
+import logging
+import timeit
+from config import JSON_CODEC
+
+logger = logging.getLogger(__name__)
+
+# В порядке предпочтения для JSON_CODEC=auto
+CODECS = ("orjson", "ujson", "json")
+
+def _stdlib():
+    # json.loads(bytes) медленнее из-за определения кодировки, поэтому декодируем сами;
+    # dumps с ensure_ascii=True быстрее, чем без экранирования
+    def loads(data):
+        if isinstance(data, (bytes, bytearray)):
+            data = data.decode()
+        return json.loads(data)
+    return loads, json.dumps
+
+def _orjson():
+    import orjson
+
+    def dumps(value):
+        return orjson.dumps(value).decode()
+    return orjson.loads, dumps
+
+def _ujson():
+    import ujson
+
+    def dumps(value):
+        return ujson.dumps(value, ensure_ascii=False, escape_forward_slashes=False)
+    return ujson.loads, dumps
+
+_FACTORIES = {"orjson": _orjson, "ujson": _ujson, "json": _stdlib}
+
+def load_codec(name):
+    """Функции (loads, dumps) кодека; loads принимает bytes и str, dumps возвращает str.
+
+    ImportError, если библиотека не установлена.
+    """
+    return _FACTORIES[name]()
+
+def available_codecs():
+    """Установленные кодеки в порядке предпочтения"""
+    codecs = []
+    for name in CODECS:
+        try:
+            load_codec(name)
+        except ImportError:
+            continue
+        codecs.append(name)
+    return codecs
+
+def select_codec(preferred=JSON_CODEC):
+    """Имя и функции кодека по настройке JSON_CODEC (auto - самый быстрый из установленных)"""
+    candidates = CODECS if preferred == "auto" else (preferred, "json")
+    for name in candidates:
+        if name not in _FACTORIES:
+            logger.warning(f"⚠️ Неизвестный JSON_CODEC={name}, используется json")
+            continue
+        try:
+            return (name, *load_codec(name))
+        except ImportError:
+            logger.warning(f"⚠️ JSON_CODEC={name}: библиотека не установлена, используется json")
+    return ("json", *_stdlib())
+
+NAME, loads, dumps = select_codec()
+
+# Участники образцов для микробенчмарка
+SAMPLE_USER = {
+    "id": 123456789, "is_bot": False, "first_name": "Иван", "last_name": "Петров",
+    "username": "ivan_petrov", "language_code": "ru"
+}
+SAMPLE_CHAT = {
+    "id": 123456789, "first_name": "Иван", "last_name": "Петров", "username": "ivan_petrov", "type": "private"
+}
+SAMPLE_BOT = {"id": 7000000001, "is_bot": True, "first_name": "AI Нейросети Гид", "username": "ai_guide_bot"}
+
+def sample_payloads():
+    """Типичные тела: нажатие кнопки нейросети, команда и ответ на нажатие.
+
+    Тексты и клавиатуры берутся из готовых экранов каталога, callback_data -
+    из callbacks.encode, поэтому образцы совпадают с тем, что шлет бот.
+    """
+    from catalog import get_catalog, DEFAULT_SORT
+    from callbacks import encode
+    from screens import get_screen
+
+    category = get_catalog().categories[0]
+    network = category.orders[DEFAULT_SORT][0]
+    category_screen = get_screen("category", category.key)
+    network_screen = get_screen("network", category.key, network.key)
+    return {
+        "callback_query": {
+            "update_id": 987654321,
+            "callback_query": {
+                "id": "4382bfdwdsb323b2d9",
+                "from": SAMPLE_USER,
+                "message": {
+                    "message_id": 4521,
+                    "from": SAMPLE_BOT,
+                    "chat": SAMPLE_CHAT,
+                    "date": 1735689600,
+                    "edit_date": 1735689660,
+                    "text": category_screen.text,
+                    "reply_markup": category_screen.keyboard.model_dump(exclude_none=True),
+                },
+                "chat_instance": "-5323232323232323232",
+                "data": encode("network", network.id),
+            },
+        },
+        "message": {
+            "update_id": 987654322,
+            "message": {
+                "message_id": 4522,
+                "from": SAMPLE_USER,
+                "chat": SAMPLE_CHAT,
+                "date": 1735689700,
+                "text": "/search нейросеть для генерации изображений",
+                "entities": [{"offset": 0, "length": 7, "type": "bot_command"}],
+            },
+        },
+        # Ответ network_callback на нажатие выше
+        "editMessageText": {
+            "chat_id": SAMPLE_CHAT["id"],
+            "message_id": 4521,
+            "text": network_screen.text,
+            "parse_mode": "Markdown",
+            "reply_markup": network_screen.keyboard.model_dump(exclude_none=True),
+        },
+    }
+
+def benchmark(number=20000):
+    """Микробенчмарк кодеков: мкс на разбор и сериализацию типичных тел"""
+    results = {}
+    payloads = sample_payloads()
+    for name in available_codecs():
+        codec_loads, codec_dumps = load_codec(name)
+        for payload_name, payload in payloads.items():
+            body = json.dumps(payload, ensure_ascii=False).encode()
+            loads_time = min(timeit.repeat(lambda: codec_loads(body), number=number, repeat=3)) / number
+            dumps_time = min(timeit.repeat(lambda: codec_dumps(payload), number=number, repeat=3)) / number
+            results[name, payload_name] = (loads_time, dumps_time)
+    return results
+
+def main():
+    results = benchmark()
+    print(f"🧮 JSON кодеки, мкс на операцию (текущий: {NAME}, ускорение - относительно json)")
+    print(f"{'кодек':<10}{'тело':<16}{'loads':>10}{'dumps':>10}{'x loads':>10}{'x dumps':>10}")
+    for (name, payload_name), (loads_time, dumps_time) in sorted(results.items(), key=lambda item: item[0][1]):
+        base_loads, base_dumps = results["json", payload_name]
+        print(
+            f"{name:<10}{payload_name:<16}{loads_time * 1e6:>10.2f}{dumps_time * 1e6:>10.2f}"
+            f"{base_loads / loads_time:>10.1f}{base_dumps / dumps_time:>10.1f}"
+        )
+
+if __name__ == "__main__":
+    main()
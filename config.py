@@ -14,6 +14,105 @@ if not BOT_TOKEN:
 # URL для webhook
 WEBHOOK_URL = os.getenv("WEBHOOK_URL")
 
+# Адрес Bot API (пусто - api.telegram.org), например локальный telegram-bot-api
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")
+
+# Пул соединений с Bot API: всего соединений, на хост (0 - без отдельного лимита),
+# сколько секунд держать простаивающее соединение, кэш DNS в секундах
+# и сколько соединений открыть заранее при запуске
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", "100"))
+API_POOL_PER_HOST = int(os.getenv("API_POOL_PER_HOST", "0"))
+API_KEEPALIVE = float(os.getenv("API_KEEPALIVE", "60"))
+API_DNS_TTL = int(os.getenv("API_DNS_TTL", "300"))
+API_POOL_WARMUP = int(os.getenv("API_POOL_WARMUP", "4"))
+# Таймаут запроса к Bot API в секундах и отдельные таймауты методов ("метод=секунды,...").
+# На callback и pre-checkout Telegram ждет ответа недолго, дольше ждать бессмысленно
+API_TIMEOUT = float(os.getenv("API_TIMEOUT", "60"))
+API_METHOD_TIMEOUTS = {
+    method.strip(): float(seconds)
+    for method, _, seconds in (
+        item.partition("=") for item in os.getenv(
+            "API_METHOD_TIMEOUTS", "answerCallbackQuery=5,answerInlineQuery=10,answerPreCheckoutQuery=10"
+        ).split(",") if item.strip()
+    )
+}
+
+# Адрес HTTP сервера и число процессов (больше 1 - мастер и воркеры на общем порту)
+WEB_HOST = os.getenv("WEB_HOST", "0.0.0.0")
+WEB_PORT = int(os.getenv("WEB_PORT", "8080"))
+WEB_PROCESSES = int(os.getenv("WEB_PROCESSES", "1"))
+
+# Плавная остановка: сколько секунд после SIGTERM ждать обработки принятых апдейтов
+# и сколько ждать готовности нового процесса при передаче сокета (SIGUSR2)
+SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", "25"))
+HANDOFF_TIMEOUT = float(os.getenv("HANDOFF_TIMEOUT", "60"))
+
+# Отвечать на апдейт прямо в HTTP ответе webhook (без отдельного запроса к API)
+WEBHOOK_REPLY_MODE = os.getenv("WEBHOOK_REPLY_MODE", "false").lower() in ("1", "true", "yes")
+
+# Очередь апдейтов webhook: число воркеров (0 - без очереди) и размер очереди.
+# С очередью апдейт подтверждается сразу, поэтому WEBHOOK_REPLY_MODE не действует
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "0"))
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+
+# Сколько последних update_id помнить для отсева повторных доставок (0 - не отсеивать)
+UPDATE_DEDUP_SIZE = int(os.getenv("UPDATE_DEDUP_SIZE", "4096"))
+
+# Проверки /healthz и /readyz: как часто измерять лаг цикла событий, при каком лаге
+# (в секундах) и заполнении очереди webhook (доля) процесс не готов, и через сколько
+# секунд без успешных запросов к Bot API (после ошибки) считать API недоступным
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "0.5"))
+HEALTH_MAX_LOOP_LAG = float(os.getenv("HEALTH_MAX_LOOP_LAG", "1"))
+HEALTH_MAX_QUEUE_FILL = float(os.getenv("HEALTH_MAX_QUEUE_FILL", "0.9"))
+HEALTH_API_STALE = float(os.getenv("HEALTH_API_STALE", "120"))
+
+# JSON кодек для тел webhook и запросов к Bot API: auto (orjson, ujson или json,
+# что установлено), orjson, ujson, json
+JSON_CODEC = os.getenv("JSON_CODEC", "auto").lower()
+
+# Метрики Prometheus на /metrics
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() in ("1", "true", "yes")
+# Токен служебных маршрутов (/metrics, /stats): запрос должен прийти с заголовком
+# Authorization: Bearer <токен>. Без токена маршруты не публикуются: порт webhook открыт наружу
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Профилирование медленных апдейтов: порог в мс (0 - выключено), профилировать
+# каждый N-й апдейт через cProfile (0 - выключено), каталог и число хранимых дампов
+PROFILE_THRESHOLD_MS = float(os.getenv("PROFILE_THRESHOLD_MS", "500"))
+PROFILE_SAMPLE_RATE = int(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "100"))
+
+# Запись входящих апдейтов webhook в JSONL для воспроизведения (replay.py).
+# id пользователей заменяются псевдонимами с ключом RECORD_SALT
+# (по умолчанию случайный на каждый запуск)
+RECORD_UPDATES = os.getenv("RECORD_UPDATES", "false").lower() in ("1", "true", "yes")
+RECORD_PATH = os.getenv("RECORD_PATH", "recordings/updates.jsonl")
+RECORD_MAX_BYTES = int(os.getenv("RECORD_MAX_BYTES", str(50 * 1024 * 1024)))
+RECORD_BACKUPS = int(os.getenv("RECORD_BACKUPS", "5"))
+RECORD_SALT = os.getenv("RECORD_SALT") or os.urandom(16).hex()
+
+# Файл каталога нейросетей и интервал проверки его изменений (0 - не следить)
+CATALOG_PATH = os.getenv("CATALOG_PATH", "catalog.json")
+CATALOG_RELOAD_INTERVAL = float(os.getenv("CATALOG_RELOAD_INTERVAL", "30"))
+
+# Сколько нейросетей показывать на одной странице категории
+CATEGORY_PAGE_SIZE = int(os.getenv("CATEGORY_PAGE_SIZE", "8"))
+
+# Inline режим: время кэша ответа на стороне Telegram, размер страницы,
+# сколько результатов держать на запрос и сколько запросов помнить
+INLINE_CACHE_TIME = int(os.getenv("INLINE_CACHE_TIME", "300"))
+INLINE_PAGE_SIZE = int(os.getenv("INLINE_PAGE_SIZE", "20"))
+INLINE_RESULTS_LIMIT = int(os.getenv("INLINE_RESULTS_LIMIT", "200"))
+INLINE_QUERY_CACHE_SIZE = int(os.getenv("INLINE_QUERY_CACHE_SIZE", "1024"))
+
+# Исходящие запросы к Bot API: сообщений в секунду на чат (и запас),
+# общий лимит в секунду и число повторов после 429
+OUTBOUND_CHAT_RATE = float(os.getenv("OUTBOUND_CHAT_RATE", "1"))
+OUTBOUND_CHAT_BURST = float(os.getenv("OUTBOUND_CHAT_BURST", "3"))
+OUTBOUND_GLOBAL_RATE = float(os.getenv("OUTBOUND_GLOBAL_RATE", "30"))
+OUTBOUND_MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", "3"))
+
 # Настройки бота
 BOT_NAME = "🤖 AI Нейросети Гид"
 BOT_DESCRIPTION = "Каталог лучших нейросетей 2025 года"
@@ -60,5 +159,37 @@ STARS_PACKAGES = {
     }
 }
 
+# Журнал платежей Stars (SQLite)
+LEDGER_PATH = os.getenv("LEDGER_PATH", "payments.db")
+# Сколько последних charge_id помнить в памяти для отсева повторов
+PAYMENT_DEDUP_CACHE_SIZE = int(os.getenv("PAYMENT_DEDUP_CACHE_SIZE", "10000"))
+
+# Хранилище состояний пользователей: "memory" или "sqlite" (переживает перезапуск
+# и общее для процессов). Обработчики бота состояния пока не используют, а
+# состояние читается на каждом апдейте, поэтому по умолчанию - только память
+STATE_STORAGE = os.getenv("STATE_STORAGE", "memory")
+STATE_PATH = os.getenv("STATE_PATH", "state.db")
+# Кэш состояний в памяти: размер и время жизни записи в секундах.
+# При нескольких процессах время жизни ограничивает, насколько устаревшее
+# состояние может увидеть процесс, поэтому его стоит держать коротким
+STATE_CACHE_SIZE = int(os.getenv("STATE_CACHE_SIZE", "10000"))
+STATE_CACHE_TTL = float(os.getenv("STATE_CACHE_TTL", "60"))
+# Через сколько секунд без изменений состояние удаляется (по умолчанию неделя)
+STATE_TTL = int(os.getenv("STATE_TTL", "604800"))
+# Отложенная запись в SQLite: интервал сброса и размер пачки для досрочного сброса
+STATE_FLUSH_INTERVAL = float(os.getenv("STATE_FLUSH_INTERVAL", "1"))
+STATE_FLUSH_BATCH = int(os.getenv("STATE_FLUSH_BATCH", "500"))
+
+# Рассылки (/broadcast): база получателей и прогресса, сколько получателей читать
+# за раз (после падения повторно получат сообщение не больше стольких), сколько
+# сообщений отправлять одновременно (скорость ограничивает OUTBOUND_GLOBAL_RATE),
+# через сколько секунд без отметок рассылку подхватывает другой процесс
+# и как часто писать прогресс в лог
+BROADCAST_PATH = os.getenv("BROADCAST_PATH", "broadcast.db")
+BROADCAST_CHUNK = int(os.getenv("BROADCAST_CHUNK", "200"))
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "30"))
+BROADCAST_LEASE = float(os.getenv("BROADCAST_LEASE", "60"))
+BROADCAST_LOG_INTERVAL = float(os.getenv("BROADCAST_LOG_INTERVAL", "30"))
+
 # ID автора для получения Stars (замените на ваш)
 AUTHOR_USER_ID = int(os.getenv("AUTHOR_USER_ID", "797749459"))
\ No newline at end of file
@@ -1,368 +1,33 @@
-# База данных нейросетей с актуальной информацией на 2025 год
+import json
 
-NEURAL_NETWORKS = {
-    "programming": {
-        "name": "💻 Программирование",
-        "description": "Нейросети для написания и анализа кода",
-        "networks": {
-            "chatgpt": {
-                "name": "ChatGPT",
-                "description": "🔥 Самая популярная нейросеть от OpenAI для программирования и решения задач любой сложности.",
-                "free_features": "• Базовая модель GPT-4o mini\n• До 40 сообщений в 3 часа\n• Поиск в интернете\n• Анализ файлов",
-                "limitations": "• Ограничения по количеству запросов\n• Нет доступа к GPT-4o\n• Нет дополнительных функций",
-                "pricing": "💰 ChatGPT Plus: $20/месяц (~2000₽)\n💎 ChatGPT Pro: $200/месяц (~20000₽)",
-                "url": "https://chat.openai.com"
-            },
-            "claude": {
-                "name": "Claude",
-                "description": "🚀 Мощная нейросеть от Anthropic, отлично подходит для программирования и анализа больших объемов кода.",
-                "free_features": "• Claude Sonnet 3.5\n• До 5 сообщений в час\n• Анализ документов\n• Работа с кодом",
-                "limitations": "• Лимит сообщений в час\n• Нет Claude Opus\n• Ограничения на загрузку файлов",
-                "pricing": "💰 Claude Pro: $20/месяц (~2000₽)\n💎 Claude Max: $200/месяц (~20000₽)",
-                "url": "https://claude.ai"
-            },
-            "github_copilot": {
-                "name": "GitHub Copilot",
-                "description": "🎯 ИИ-помощник для программирования, интегрированный в IDE. Автодополнение кода в реальном времени.",
-                "free_features": "• Бесплатно для студентов\n• Бесплатно для open-source проектов\n• 30-дневная пробная версия",
-                "limitations": "• Только для зарегистрированных разработчиков\n• Требует IDE поддержку\n• Ограниченная функциональность без подписки",
-                "pricing": "💰 Individual: $10/месяц (~1000₽)\n💼 Business: $19/месяц на пользователя",
-                "url": "https://github.com/features/copilot"
-            },
-            "cursor": {
-                "name": "Cursor",
-                "description": "⚡ Революционный ИИ-редактор кода с встроенным GPT-4. Полная замена VS Code с ИИ-возможностями.",
-                "free_features": "• 2000 автодополнений в месяц\n• 50 медленных premium запросов\n• Базовый чат с ИИ",
-                "limitations": "• Лимит на premium функции\n• Медленная скорость ответов в бесплатной версии",
-                "pricing": "💰 Pro: $20/месяц (~2000₽)\n💼 Business: $40/месяц на пользователя",
-                "url": "https://cursor.sh"
-            },
-            "codeium": {
-                "name": "Codeium",
-                "description": "🆓 Бесплатная альтернativa GitHub Copilot. Автодополнение кода и чат с ИИ.",
-                "free_features": "• Неограниченное автодополнение\n• Чат с ИИ\n• Поддержка 70+ языков программирования\n• Интеграция с популярными IDE",
-                "limitations": "• Менее точное автодополнение чем у платных аналогов\n• Ограниченные возможности чата",
-                "pricing": "🆓 Полностью бесплатно для индивидуального использования\n💼 Teams: $12/месяц на пользователя",
-                "url": "https://codeium.com"
-            }
-        }
-    },
-    "text": {
-        "name": "✍️ Написание текстов",
-        "description": "Нейросети для создания контента, постов и статей",
-        "networks": {
-            "chatgpt": {
-                "name": "ChatGPT",
-                "description": "🔥 Лидер в создании текстового контента. Пишет посты, статьи, сценарии любой сложности.",
-                "free_features": "• Создание текстов любой тематики\n• Редактирование и улучшение текстов\n• Переводы\n• Генерация идей",
-                "limitations": "• Ограничения по количеству запросов\n• Нет доступа к последним данным без поиска",
-                "pricing": "💰 ChatGPT Plus: $20/месяц (~2000₽)\n💎 ChatGPT Pro: $200/месяц (~20000₽)",
-                "url": "https://chat.openai.com"
-            },
-            "yandexgpt": {
-                "name": "YandexGPT",
-                "description": "🇷🇺 Российская нейросеть от Яндекса. Отлично понимает русский язык и культурные особенности.",
-                "free_features": "• До 10 запросов в день\n• Генерация текстов на русском\n• Работа с документами\n• Базовые возможности чата",
-                "limitations": "• Лимит бесплатных запросов\n• Меньше возможностей чем у ChatGPT\n• Требует российский номер телефона",
-                "pricing": "💰 От 1₽ за 1000 токенов\n📦 Пакеты от 500₽/месяц",
-                "url": "https://yandex.ru/gpt"
-            },
-            "jasper": {
-                "name": "Jasper AI",
-                "description": "📝 Специализированная нейросеть для маркетингового контента. Идеальна для бизнеса.",
-                "free_features": "• 7-дневная пробная версия\n• Базовые шаблоны контента",
-                "limitations": "• Нет постоянного бесплатного тарифа\n• Ограниченная пробная версия",
-                "pricing": "💰 Creator: $39/месяц (~4000₽)\n💼 Pro: $99/месяц (~10000₽)",
-                "url": "https://jasper.ai"
-            },
-            "copy_ai": {
-                "name": "Copy.ai",
-                "description": "🚀 ИИ для создания маркетингового контента, постов в соцсетях и рекламных текстов.",
-                "free_features": "• 2000 слов в месяц\n• Базовые шаблоны\n• Создание постов для соцсетей\n• Email маркетинг",
-                "limitations": "• Лимит слов в месяц\n• Ограниченные шаблоны в бесплатной версии",
-                "pricing": "💰 Pro: $36/месяц (~3600₽)\n💼 Team: $186/месяц для команды",
-                "url": "https://copy.ai"
-            }
-        }
-    },
-    "image": {
-        "name": "🎨 Генерация изображений",
-        "description": "Нейросети для создания и обработки изображений",
-        "networks": {
-            "midjourney": {
-                "name": "Midjourney",
-                "description": "👑 Король генерации изображений. Создает невероятно качественные и художественные изображения.",
-                "free_features": "• Нет бесплатного тарифа (был отменен)\n• Только пробная версия через Discord",
-                "limitations": "• Полностью платный сервис\n• Работает только через Discord\n• Требует знания английского для промптов",
-                "pricing": "💰 Basic: $10/месяц (~1000₽) - 200 изображений\n💎 Standard: $30/месяц (~3000₽) - 15 часов\n🔥 Pro: $60/месяц (~6000₽) - 30 часов",
-                "url": "https://midjourney.com"
-            },
-            "dall_e": {
-                "name": "DALL-E 3",
-                "description": "🤖 Нейросеть от OpenAI для генерации изображений. Интегрирована в ChatGPT.",
-                "free_features": "• Доступна через ChatGPT бесплатно (ограниченно)\n• Высокое качество изображений\n• Понимает сложные описания",
-                "limitations": "• Лимит на количество генераций\n• Доступна только через ChatGPT\n• Строгие ограничения контента",
-                "pricing": "💰 Включена в ChatGPT Plus: $20/месяц (~2000₽)\n🔧 API: $0.040 за изображение 1024×1024",
-                "url": "https://openai.com/dall-e-3"
-            },
-            "kandinsky": {
-                "name": "Kandinsky 3.1",
-                "description": "🇷🇺 Российская нейросеть от Сбера для генерации изображений. Понимает русские промпты.",
-                "free_features": "• Бесплатная генерация (с лимитами)\n• Русский интерфейс\n• Поддержка русских промптов\n• Разные стили изображений",
-                "limitations": "• Качество ниже чем у Midjourney\n• Лимиты на бесплатные генерации\n• Может быть нестабильной",
-                "pricing": "🆓 Базовый тариф бесплатно\n💰 Расширенные возможности от 290₽/месяц",
-                "url": "https://fusionbrain.ai"
-            },
-            "leonardo": {
-                "name": "Leonardo AI",
-                "description": "⚡ Мощная нейросеть для создания изображений с множеством стилей и моделей.",
-                "free_features": "• 150 токенов в день\n• Базовые модели\n• Генерация изображений до 512x512",
-                "limitations": "• Лимит токенов в день\n• Водяной знак на изображениях\n• Ограниченное разрешение",
-                "pricing": "💰 Apprentice: $10/месяц (~1000₽)\n💎 Artisan: $24/месяц (~2400₽)",
-                "url": "https://leonardo.ai"
-            },
-            "stable_diffusion": {
-                "name": "Stable Diffusion",
-                "description": "🔓 Открытая нейросеть для генерации изображений. Можно использовать бесплатно.",
-                "free_features": "• Полностью бесплатна (при локальной установке)\n• Множество моделей и стилей\n• Настраиваемые параметры\n• Активное сообщество",
-                "limitations": "• Требует мощный компьютер для локального запуска\n• Сложна в настройке для новичков\n• Онлайн-сервисы имеют лимиты",
-                "pricing": "🆓 Бесплатно (локально)\n💰 Онлайн-сервисы: от $10/месяц",
-                "url": "https://stability.ai"
-            }
-        }
-    },
-    "music": {
-        "name": "🎵 Генерация музыки",
-        "description": "ИИ для создания музыки и аудиоконтента",
-        "networks": {
-            "suno": {
-                "name": "Suno AI",
-                "description": "🎼 Революционная нейросеть для создания полноценных музыкальных композиций с текстом и мелодией.",
-                "free_features": "• 10 песен в день\n• Длительность до 2 минут\n• Различные жанры и стили\n• Создание текста и музыки",
-                "limitations": "• Лимит на количество генераций\n• Ограничение по времени трека\n• Водяной знак в бесплатной версии",
-                "pricing": "💰 Pro: $10/месяц (~1000₽) - 500 песен\n💎 Premier: $30/месяч (~3000₽) - 2000 песен",
-                "url": "https://suno.com"
-            },
-            "mubert": {
-                "name": "Mubert",
-                "description": "🎧 ИИ для создания фоновой музыки и саундтреков под конкретные задачи.",
-                "free_features": "• Базовая генерация треков\n• Несколько стилей музыки\n• Короткие композиции",
-                "limitations": "• Ограниченная длительность треков\n• Лимит скачиваний\n• Водяной знак",
-                "pricing": "💰 Creator: $14/месяц (~1400₽)\n💼 Pro: $39/месяц (~3900₽)",
-                "url": "https://mubert.com"
-            },
-            "udio": {
-                "name": "Udio",
-                "description": "🎤 Новая мощная нейросеть для создания музыки с вокалом и инструментальными партиями.",
-                "free_features": "• Ограниченное количество генераций\n• Высокое качество аудио\n• Различные жанры",
-                "limitations": "• Бета-версия с ограниченным доступом\n• Лимиты на количество треков",
-                "pricing": "💰 Планы уточняются (в разработке)",
-                "url": "https://udio.com"
-            }
-        }
-    },
-    "video": {
-        "name": "🎬 Генерация видео",
-        "description": "Нейросети для создания и обработки видео",
-        "networks": {
-            "runway": {
-                "name": "Runway ML",
-                "description": "🎥 Профессиональная платформа для создания видео с помощью ИИ. Множество инструментов для видеопродакшена.",
-                "free_features": "• 125 кредитов в месяц\n• Базовые AI инструменты\n• Генерация коротких видео\n• Обработка видео",
-                "limitations": "• Лимит кредитов\n• Водяной знак на видео\n• Ограничение по длительности",
-                "pricing": "💰 Standard: $15/месяц (~1500₽)\n💎 Pro: $35/месяц (~3500₽)\n🔥 Unlimited: $95/месяц (~9500₽)",
-                "url": "https://runwayml.com"
-            },
-            "pika": {
-                "name": "Pika Labs",
-                "description": "⚡ Простая нейросеть для создания коротких видео из текста и изображений.",
-                "free_features": "• Ограниченные генерации в день\n• Создание видео из текста\n• Анимация изображений",
-                "limitations": "• Короткие видео (3-4 секунды)\n• Лимиты на количество генераций\n• Очередь на генерацию",
-                "pricing": "💰 Standard: $10/месяц (~1000₽)\n💎 Pro: $35/месяц (~3500₽)",
-                "url": "https://pika.art"
-            },
-            "kling": {
-                "name": "Kling AI",
-                "description": "🚀 Китайская нейросеть для генерации высококачественных видео длительностью до 10 секунд.",
-                "free_features": "• Несколько бесплатных генераций в день\n• Высокое качество видео\n• Реалистичные движения",
-                "limitations": "• Очень ограниченные бесплатные генерации\n• Требует VPN для доступа\n• Китайский интерфейс",
-                "pricing": "💰 Подписка от $10/месяц (~1000₽)",
-                "url": "https://kling.kuaishou.com"
-            },
-            "luma_dream": {
-                "name": "Luma Dream Machine",
-                "description": "🌟 Новая нейросеть для создания реалистичных видео из текстовых описаний.",
-                "free_features": "• 30 генераций в месяц\n• Высокое качество\n• Реалистичная физика",
-                "limitations": "• Лимит генераций\n• Очереди в пиковое время\n• Ограничения по контенту",
-                "pricing": "💰 Standard: $30/месяц (~3000₽)\n💎 Pro: $100/месяц (~10000₽)",
-                "url": "https://lumalabs.ai/dream-machine"
-            }
-        }
-    },
-    "voice": {
-        "name": "🎤 Работа с голосом",
-        "description": "ИИ для синтеза речи и обработки аудио",
-        "networks": {
-            "elevenlabs": {
-                "name": "ElevenLabs",
-                "description": "🔊 Лучшая нейросеть для клонирования голоса и синтеза речи с невероятным качеством.",
-                "free_features": "• 10,000 символов в месяц\n• 3 кастомных голоса\n• Базовые голоса\n• Коммерческое использование",
-                "limitations": "• Лимит символов\n• Ограниченное количество голосов\n• Нет расширенных функций",
-                "pricing": "💰 Starter: $5/месяц (~500₽)\n💎 Creator: $22/месяц (~2200₽)\n🔥 Pro: $99/месяц (~9900₽)",
-                "url": "https://elevenlabs.io"
-            },
-            "murf": {
-                "name": "Murf AI",
-                "description": "🎙️ Профессиональная платформа для создания озвучки с множеством голосов на разных языках.",
-                "free_features": "• 10 минут генерации\n• Базовые голоса\n• Простой редактор",
-                "limitations": "• Лимит времени генерации\n• Водяной знак\n• Ограниченные голоса",
-                "pricing": "💰 Basic: $19/месяц (~1900₽)\n💎 Pro: $26/месяц (~2600₽)",
-                "url": "https://murf.ai"
-            },
-            "speechify": {
-                "name": "Speechify",
-                "description": "📖 ИИ для преобразования текста в речь с фокусом на чтение и обучение.",
-                "free_features": "• Базовые голоса\n• Ограниченное время прослушивания\n• Простой интерфейс",
-                "limitations": "• Лимиты времени\n• Реклама в бесплатной версии\n• Ограниченные настройки",
-                "pricing": "💰 Premium: $11.58/месяц (~1200₽)",
-                "url": "https://speechify.com"
-            }
-        }
-    },
-    "data": {
-        "name": "📊 Анализ данных",
-        "description": "ИИ для работы с данными и аналитикой",
-        "networks": {
-            "chatgpt_advanced": {
-                "name": "ChatGPT Advanced Data Analysis",
-                "description": "📈 Расширенные возможности ChatGPT для анализа данных, работы с таблицами и графиками.",
-                "free_features": "• Базовый анализ данных\n• Работа с CSV файлами\n• Простые вычисления",
-                "limitations": "• Ограниченные возможности в бесплатной версии\n• Лимиты на размер файлов",
-                "pricing": "💰 ChatGPT Plus: $20/месяц (~2000₽) для полных возможностей",
-                "url": "https://chat.openai.com"
-            },
-            "claude_analysis": {
-                "name": "Claude для анализа данных",
-                "description": "🔍 Мощные аналитические возможности Claude для работы с большими объемами данных.",
-                "free_features": "• Анализ документов\n• Работа с таблицами\n• Статистический анализ\n• Визуализация данных",
-                "limitations": "• Лимиты на количество сообщений\n• Размер загружаемых файлов",
-                "pricing": "💰 Claude Pro: $20/месяц (~2000₽)",
-                "url": "https://claude.ai"
-            },
-            "dataiku": {
-                "name": "Dataiku",
-                "description": "🏢 Профессиональная платформа для data science с ИИ-возможностями.",
-                "free_features": "• Бесплатная версия для небольших проектов\n• Базовые ML алгоритмы\n• Ограниченные ресурсы",
-                "limitations": "• Лимиты на количество пользователей\n• Ограниченные вычислительные ресурсы",
-                "pricing": "💰 От $50/месяц за пользователя",
-                "url": "https://dataiku.com"
-            }
-        }
-    },
-    "translation": {
-        "name": "🌐 Переводы",
-        "description": "ИИ для перевода и работы с языками",
-        "networks": {
-            "deepl": {
-                "name": "DeepL",
-                "description": "🎯 Самый точный переводчик с использованием нейронных сетей. Превосходит Google Translate.",
-                "free_features": "• 5000 символов в месяц\n• Базовые языки\n• Высокое качество перевода",
-                "limitations": "• Лимит символов\n• Ограниченное количество языков\n• Нет API в бесплатной версии",
-                "pricing": "💰 Pro: $6.99/месяц (~700₽)\n💼 Advanced: $22.99/месяц (~2300₽)",
-                "url": "https://deepl.com"
-            },
-            "yandex_translate": {
-                "name": "Яндекс Переводчик",
-                "description": "🇷🇺 Российский переводчик с поддержкой множества языков и ИИ-технологиями.",
-                "free_features": "• Неограниченные переводы\n• Множество языков\n• Перевод изображений\n• Голосовой перевод",
-                "limitations": "• Качество ниже чем у DeepL для некоторых языков\n• Ограничения API",
-                "pricing": "🆓 Базовое использование бесплатно\n💰 API: от 1.5₽ за млн символов",
-                "url": "https://translate.yandex.ru"
-            },
-            "chatgpt_translate": {
-                "name": "ChatGPT для переводов",
-                "description": "🔄 Использование ChatGPT для качественных переводов с пониманием контекста.",
-                "free_features": "• Контекстуальные переводы\n• Объяснения переводов\n• Адаптация под стиль",
-                "limitations": "• Лимиты бесплатной версии\n• Не специализирован именно на переводах",
-                "pricing": "💰 ChatGPT Plus: $20/месяц (~2000₽)",
-                "url": "https://chat.openai.com"
-            }
-        }
-    },
-    "search": {
-        "name": "🔍 Поиск и исследования",
-        "description": "ИИ для поиска информации и исследований",
-        "networks": {
-            "perplexity": {
-                "name": "Perplexity AI",
-                "description": "🔍 Поисковик нового поколения с ИИ. Находит актуальную информацию и дает развернутые ответы.",
-                "free_features": "• Поиск с ИИ-ответами\n• Источники информации\n• Быстрые ответы\n• Мобильное приложение",
-                "limitations": "• Лимит на количество запросов Pro поиска\n• Ограниченные возможности без подписки",
-                "pricing": "💰 Pro: $20/месяц (~2000₽)\n🎓 Скидки для студентов",
-                "url": "https://perplexity.ai"
-            },
-            "you_com": {
-                "name": "You.com",
-                "description": "🎯 Поисковик с ИИ-чатом и возможностью выбора разных моделей для ответов.",
-                "free_features": "• Поиск с ИИ\n• Разные модели ИИ\n• Источники информации\n• Создание контента",
-                "limitations": "• Лимиты на премиум модели\n• Ограничения на количество запросов",
-                "pricing": "💰 Pro: $15/месяц (~1500₽)",
-                "url": "https://you.com"
-            },
-            "bing_chat": {
-                "name": "Microsoft Copilot (Bing Chat)",
-                "description": "🤖 ИИ-помощник от Microsoft с доступом к актуальной информации через поиск Bing.",
-                "free_features": "• Бесплатные поиски с ИИ\n• Доступ к интернету\n• Генерация изображений\n• Интеграция с Microsoft",
-                "limitations": "• Лимит сообщений в день\n• Менее развитый чем ChatGPT\n• Строгие фильтры контента",
-                "pricing": "🆓 Полностью бесплатно\n💰 Microsoft 365 Copilot: $30/месяц для бизнеса",
-                "url": "https://copilot.microsoft.com"
-            }
-        }
-    },
-    "other": {
-        "name": "🔧 Другие полезные ИИ",
-        "description": "Специализированные нейросети для различных задач",
-        "networks": {
-            "notion_ai": {
-                "name": "Notion AI",
-                "description": "📝 ИИ-помощник интегрированный в Notion для управления знаниями и продуктивности.",
-                "free_features": "• Ограниченные ИИ-запросы\n• Базовые функции редактирования\n• Интеграция с Notion",
-                "limitations": "• Работает только внутри Notion\n• Лимит ИИ-запросов\n• Требует подписку Notion",
-                "pricing": "💰 Notion AI: $10/месяц (~1000₽) дополнительно к Notion",
-                "url": "https://notion.so"
-            },
-            "gamma": {
-                "name": "Gamma",
-                "description": "📊 ИИ для создания презентаций, документов и веб-страниц из простого текста.",
-                "free_features": "• 400 ИИ-кредитов\n• Базовые шаблоны\n• Экспорт в PDF\n• Простой редактор",
-                "limitations": "• Лимит кредитов\n• Брендинг Gamma\n• Ограниченные шаблоны",
-                "pricing": "💰 Plus: $8/месяц (~800₽)\n💎 Pro: $16/месяц (~1600₽)",
-                "url": "https://gamma.app"
-            },
-            "tome": {
-                "name": "Tome",
-                "description": "🎨 ИИ для создания интерактивных презентаций и историй с красивым дизайном.",
-                "free_features": "• 500 ИИ-кредитов\n• Базовые шаблоны\n• Экспорт презентаций",
-                "limitations": "• Лимит кредитов\n• Ограниченные возможности экспорта\n• Водяной знак",
-                "pricing": "💰 Pro: $16/месяц (~1600₽)",
-                "url": "https://tome.app"
-            },
-            "replika": {
-                "name": "Replika",
-                "description": "👥 ИИ-компаньон для общения и эмоциональной поддержки. Персонализированный чатбот.",
-                "free_features": "• Базовое общение\n• Простые активности\n• Ограниченная персонализация",
-                "limitations": "• Ограниченные функции без подписки\n• Лимиты на сообщения\n• Нет голосовых звонков",
-                "pricing": "💰 Pro: $19.99/месяц (~2000₽)\n💎 Lifetime: $299 (~30000₽)",
-                "url": "https://replika.ai"
-            },
-            "character_ai": {
-                "name": "Character.AI",
-                "description": "🎭 Платформа для создания и общения с ИИ-персонажами любых типов.",
-                "free_features": "• Неограниченное общение\n• Создание персонажей\n• Публичные персонажи\n• Групповые чаты",
-                "limitations": "• Очереди в пиковое время\n• Ограничения на контент\n• Менее умные персонажи",
-                "pricing": "💰 Plus: $9.99/месяц (~1000₽)",
-                "url": "https://character.ai"
-            }
-        }
-    }
-}
\ No newline at end of file
+# База данных нейросетей хранится во внешнем файле (см. CATALOG_PATH),
+# чтобы обновлять цены без перезапуска бота
+
+def load_neural_networks(path):
+    """Читает каталог нейросетей из JSON файла"""
+    with open(path, 'r', encoding='utf-8') as f:
+        neural_networks = json.load(f)
+
+    # Минимальная проверка структуры, чтобы не подменить каталог мусором.
+    # id попадают в callback_data отправленных кнопок, поэтому они обязательны
+    # и уникальны: категории среди категорий, нейросети среди всех нейросетей
+    category_ids = set()
+    network_ids = set()
+    for category_id, category_data in neural_networks.items():
+        if 'name' not in category_data or 'networks' not in category_data:
+            raise ValueError(f"Категория {category_id} без name/networks")
+        _check_id(category_data, category_ids, f"Категория {category_id}")
+        for network_id, network_data in category_data['networks'].items():
+            if 'name' not in network_data or 'url' not in network_data:
+                raise ValueError(f"Нейросеть {category_id}/{network_id} без name/url")
+            _check_id(network_data, network_ids, f"Нейросеть {category_id}/{network_id}")
+
+    return neural_networks
+
+def _check_id(item, seen, name):
+    item_id = item.get('id')
+    if not isinstance(item_id, int) or isinstance(item_id, bool) or item_id < 0:
+        raise ValueError(f"{name} без целого неотрицательного id")
+    if item_id in seen:
+        raise ValueError(f"{name}: id {item_id} уже занят")
+    seen.add(item_id)
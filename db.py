@@ -0,0 +1,28 @@
+import sqlite3
+from contextlib import contextmanager
+
+def connect(path, schema=None):
+    """Соединение SQLite для хранилищ бота: WAL, без неявных транзакций,
+    общее для потоков процесса (доступ к нему хранилище защищает своей блокировкой).
+
+    Несколько процессов пишут в один файл по очереди: busy_timeout ждет блокировку.
+    """
+    connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute("PRAGMA busy_timeout=5000")
+    if schema:
+        connection.executescript(schema)
+    return connection
+
+@contextmanager
+def transaction(connection):
+    """Транзакция записи: BEGIN IMMEDIATE сразу берет блокировку файла,
+    при выходе COMMIT, при исключении ROLLBACK"""
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        yield connection
+        connection.execute("COMMIT")
+    except Exception:
+        connection.execute("ROLLBACK")
+        raise
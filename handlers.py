@@ -1,17 +1,25 @@
+import asyncio
+import logging
+import time
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
-from aiogram.filters import CommandStart, Command
+from aiogram.filters import CommandStart, Command, CommandObject
 
-from aiogram.types import Message, CallbackQuery, PreCheckoutQuery
-from data import NEURAL_NETWORKS
+from aiogram.types import Message, CallbackQuery, PreCheckoutQuery, InlineQuery
 from keyboards import (
-    get_main_menu_keyboard, 
-    get_category_keyboard, 
-    get_network_keyboard,
+    get_pages_count,
     get_help_keyboard,
-    get_about_keyboard
+    get_about_keyboard,
+    get_search_results_keyboard
 )
-from config import BOT_NAME, BOT_DESCRIPTION, AUTHOR_USER_ID
+from screens import get_screen, get_main_menu_markup
+from search import search_networks
+from inline import get_inline_page
+from ledger import get_statistics
+from profiling import get_slow_updates
+from catalog import get_catalog, SORT_ORDERS, DEFAULT_SORT
+from callbacks import callback_route, route_filter, SORT_CODES, PACKAGE_IDS
+from config import BOT_NAME, BOT_DESCRIPTION, AUTHOR_USER_ID, INLINE_CACHE_TIME, WEBHOOK_REPLY_MODE
 from stars import (
     get_support_info_text,
     get_support_keyboard,
@@ -22,9 +30,41 @@ from stars import (
 )
 
 
+logger = logging.getLogger(__name__)
+
 # Создаем роутер для обработчиков
 router = Router()
 
+# Второстепенные вызовы API, запущенные параллельно с основным ответом
+_background_calls = set()
+
+async def respond(method):
+    """Основной ответ на апдейт.
+
+    В режиме WEBHOOK_REPLY_MODE метод возвращается из обработчика и уходит
+    в теле ответа на webhook без отдельного запроса к API, иначе вызывается сразу.
+    """
+    if WEBHOOK_REPLY_MODE:
+        return method
+    return await method
+
+async def _call_silently(method):
+    try:
+        await method
+    except Exception as e:
+        logger.error(f"Ошибка фонового вызова {type(method).__name__}: {e}")
+
+def run_in_background(method):
+    """Запускает второстепенный вызов API (например, callback.answer()) параллельно"""
+    task = asyncio.create_task(_call_silently(method))
+    _background_calls.add(task)
+    task.add_done_callback(_background_calls.discard)
+
+async def drain_background_calls():
+    """Ждет завершения вызовов, запущенных run_in_background (при остановке)"""
+    while _background_calls:
+        await asyncio.wait(set(_background_calls))
+
 @router.message(CommandStart())
 async def start_command(message: Message):
     """Обработчик команды /start"""
@@ -41,28 +81,21 @@ async def start_command(message: Message):
 
 Выберите интересующую вас категорию:"""
 
-    await message.answer(
+    return await respond(message.answer(
         text=welcome_text,
-        reply_markup=get_main_menu_keyboard()
-    )
+        reply_markup=get_main_menu_markup()
+    ))
 
 @router.message(Command("categories"))
 async def categories_command(message: Message):
     """Обработчик команды /categories"""
-    categories_text = "📂 **Доступные категории нейросетей:**\n\n"
+    screen = get_screen("categories")
     
-    for category_id, category_data in NEURAL_NETWORKS.items():
-        networks_count = len(category_data['networks'])
-        categories_text += f"• {category_data['name']} ({networks_count} нейросетей)\n"
-        categories_text += f"  _{category_data['description']}_\n\n"
-    
-    categories_text += "Выберите категорию для просмотра доступных нейросетей:"
-    
-    await message.answer(
-        text=categories_text,
-        reply_markup=get_main_menu_keyboard(),
+    return await respond(message.answer(
+        text=screen.text,
+        reply_markup=screen.keyboard,
         parse_mode="Markdown"
-    )
+    ))
 
 @router.message(Command("help"))
 async def help_command(message: Message):
@@ -79,6 +112,7 @@ async def help_command(message: Message):
 📋 **Доступные команды:**
 • `/start` - Запустить бота заново
 • `/categories` - Показать все категории
+• `/search запрос` - Найти нейросеть по названию, описанию или цене
 • `/help` - Показать эту справку
 
 🆕 **Обновления:**
@@ -87,98 +121,98 @@ async def help_command(message: Message):
 ⚠️ **Важно:**
 Цены и условия могут изменяться. Всегда проверяйте актуальную информацию на официальных сайтах нейросетей."""
 
-    await message.answer(
+    return await respond(message.answer(
         text=help_text,
         reply_markup=get_help_keyboard(),
         parse_mode="Markdown"
-    )
+    ))
+
+@router.message(Command("search"))
+async def search_command(message: Message, command: CommandObject):
+    """Обработчик команды /search"""
+    query = (command.args or "").strip()
+    
+    if not query:
+        return await respond(message.answer(
+            text="🔍 Укажите запрос после команды, например: `/search видео бесплатно`",
+            parse_mode="Markdown"
+        ))
+    
+    networks = search_networks(query)
+    
+    if not networks:
+        return await respond(message.answer(
+            text="😔 Ничего не найдено. Попробуйте другой запрос или выберите категорию:",
+            reply_markup=get_main_menu_markup()
+        ))
+    
+    # Единственный результат сразу показываем карточкой нейросети
+    if len(networks) == 1:
+        network = networks[0]
+        screen = get_screen("network", network.category_key, network.key)
+        return await respond(message.answer(
+            text=screen.text,
+            reply_markup=screen.keyboard,
+            parse_mode="Markdown"
+        ))
+    
+    return await respond(message.answer(
+        text=f"🔍 Найдено нейросетей: {len(networks)}\n\nВыберите интересующую вас нейросеть:",
+        reply_markup=get_search_results_keyboard(networks)
+    ))
 
-@router.callback_query(F.data == "main_menu")
+@callback_route("main_menu")
 async def main_menu_callback(callback: CallbackQuery):
     """Обработчик возврата в главное меню"""
-    main_menu_text = f"""🏠 **Главное меню - {BOT_NAME}**
-
-📊 **Статистика бота:**
-• {len(NEURAL_NETWORKS)} категорий нейросетей
-• {sum(len(cat['networks']) for cat in NEURAL_NETWORKS.values())} ИИ в базе данных
-• Актуальная информация на {callback.message.date.strftime('%B %Y')}
-
-Выберите категорию для изучения доступных нейросетей:"""
+    screen = get_screen("main_menu")
+    main_menu_text = screen.text.format(date=callback.message.date.strftime('%B %Y'))
 
-    await callback.message.edit_text(
+    run_in_background(callback.answer())
+    return await respond(callback.message.edit_text(
         text=main_menu_text,
-        reply_markup=get_main_menu_keyboard(),
+        reply_markup=screen.keyboard,
         parse_mode="Markdown"
-    )
-    await callback.answer()
+    ))
 
-@router.callback_query(F.data.startswith("category:"))
-async def category_callback(callback: CallbackQuery):
+@callback_route("category", args=1, optional=2)
+async def category_callback(callback: CallbackQuery, category_id: int, sort_index: int = None, page: int = 0):
     """Обработчик выбора категории"""
-    category_id = callback.data.split(":")[1]
+    category = get_catalog().category_by_id(category_id)
+    if category is None:
+        return await respond(callback.answer("❌ Категория не найдена!", show_alert=True))
     
-    if category_id not in NEURAL_NETWORKS:
-        await callback.answer("❌ Категория не найдена!", show_alert=True)
-        return
-    
-    category_data = NEURAL_NETWORKS[category_id]
-    networks_count = len(category_data['networks'])
-    
-    category_text = f"""📂 **{category_data['name']}**
-
-📝 _{category_data['description']}_
-
-🤖 **Доступно нейросетей:** {networks_count}
-
-Выберите интересующую вас нейросеть для получения подробной информации:"""
-
-    await callback.message.edit_text(
-        text=category_text,
-        reply_markup=get_category_keyboard(category_id),
+    # Кнопки старых сообщений могут ссылаться на страницу, которой после
+    # обновления каталога нет, или на убранную сортировку: показываем ближайшее
+    sort = DEFAULT_SORT
+    if sort_index is not None and sort_index < len(SORT_CODES) and SORT_CODES[sort_index] in SORT_ORDERS:
+        sort = SORT_CODES[sort_index]
+    page = min(page, get_pages_count(category) - 1)
+    screen = get_screen("category", category.key, (sort, page))
+
+    run_in_background(callback.answer())
+    return await respond(callback.message.edit_text(
+        text=screen.text,
+        reply_markup=screen.keyboard,
         parse_mode="Markdown"
-    )
-    await callback.answer()
+    ))
 
-@router.callback_query(F.data.startswith("network:"))
-async def network_callback(callback: CallbackQuery):
+@callback_route("network", args=1)
+async def network_callback(callback: CallbackQuery, network_id: int):
     """Обработчик выбора нейросети"""
-    try:
-        _, category_id, network_id = callback.data.split(":")
-    except ValueError:
-        await callback.answer("❌ Неверный формат данных!", show_alert=True)
-        return
+    network = get_catalog().network_by_id(network_id)
+    screen = get_screen("network", network.category_key, network.key) if network is not None else None
     
-    if (category_id not in NEURAL_NETWORKS or 
-        network_id not in NEURAL_NETWORKS[category_id]['networks']):
-        await callback.answer("❌ Нейросеть не найдена!", show_alert=True)
-        return
-    
-    network_data = NEURAL_NETWORKS[category_id]['networks'][network_id]
-    
-    network_text = f"""🤖 **{network_data['name']}**
-
-📋 **Описание:**
-{network_data['description']}
+    if screen is None:
+        return await respond(callback.answer("❌ Нейросеть не найдена!", show_alert=True))
 
-🆓 **Бесплатные возможности:**
-{network_data['free_features']}
-
-⚠️ **Ограничения бесплатной версии:**
-{network_data['limitations']}
-
-💰 **Стоимость подписки:**
-{network_data['pricing']}
-
-🔗 Нажмите кнопку ниже, чтобы перейти на официальный сайт."""
-
-    await callback.message.edit_text(
-        text=network_text,
-        reply_markup=get_network_keyboard(category_id, network_id),
+    run_in_background(callback.answer())
+    return await respond(callback.message.edit_text(
+        text=screen.text,
+        reply_markup=screen.keyboard,
         parse_mode="Markdown"
-    )
-    await callback.answer()
+    ))
 
-@router.callback_query(F.data == "help")
+@callback_route("help")
 async def help_callback(callback: CallbackQuery):
     """Обработчик кнопки помощи"""
     help_text = """❓ **Справка по боту**
@@ -202,46 +236,26 @@ async def help_callback(callback: CallbackQuery):
 📱 **Контакты:**
 Если у вас есть предложения по улучшению бота или вы хотите добавить новую нейросеть - свяжитесь с разработчиком."""
 
-    await callback.message.edit_text(
+    run_in_background(callback.answer())
+    return await respond(callback.message.edit_text(
         text=help_text,
         reply_markup=get_help_keyboard(),
         parse_mode="Markdown"
-    )
-    await callback.answer()
+    ))
 
-@router.callback_query(F.data == "about")
+@callback_route("about")
 async def about_callback(callback: CallbackQuery):
     """Обработчик кнопки 'О боте'"""
-    about_text = f"""ℹ️ **О боте {BOT_NAME}**
-
-🎯 **Миссия:** Упростить выбор подходящей нейросети для любых задач.
-
-📊 **Актуальная статистика:**
-• Категорий: {len(NEURAL_NETWORKS)}
-• Нейросетей в базе: {sum(len(cat['networks']) for cat in NEURAL_NETWORKS.values())}
-• Последнее обновление: Январь 2025
-
-⚡ **Особенности:**
-• Актуальные цены и возможности
-• Подробные описания каждой ИИ
-• Прямые ссылки на официальные сайты
-• Регулярные обновления базы данных
-• Простая навигация и поиск
+    screen = get_screen("about")
 
-🔄 **Обновления:**
-Информация о нейросетях обновляется каждый месяц для поддержания актуальности данных о ценах и возможностях.
-
-💝 **Поддержка проекта:**
-Если бот полезен для вас, поделитесь им с друзьями и коллегами!"""
-
-    await callback.message.edit_text(
-        text=about_text,
-        reply_markup=get_about_keyboard(),
+    run_in_background(callback.answer())
+    return await respond(callback.message.edit_text(
+        text=screen.text,
+        reply_markup=screen.keyboard,
         parse_mode="Markdown"
-    )
-    await callback.answer()
+    ))
 
-@router.callback_query(F.data == "updates")
+@callback_route("updates")
 async def updates_callback(callback: CallbackQuery):
     """Обработчик информации об обновлениях"""
     updates_text = """🔄 **История обновлений**
@@ -266,29 +280,31 @@ async def updates_callback(callback: CallbackQuery):
 
 🔔 **Следите за обновлениями** - база данных пополняется каждый месяц!"""
 
-    await callback.message.edit_text(
+    run_in_background(callback.answer())
+    return await respond(callback.message.edit_text(
         text=updates_text,
         reply_markup=get_about_keyboard(),
         parse_mode="Markdown"
-    )
-    await callback.answer()
+    ))
 
-@router.callback_query(F.data == "support")
+@callback_route("support")
 async def support_callback(callback: CallbackQuery):
     """Обработчик кнопки поддержки проекта"""
     support_text = get_support_info_text()
     
-    await callback.message.edit_text(
+    run_in_background(callback.answer())
+    return await respond(callback.message.edit_text(
         text=support_text,
         reply_markup=get_support_keyboard(),
         parse_mode="Markdown"
-    )
-    await callback.answer()
+    ))
 
-@router.callback_query(F.data.startswith("support:"))
-async def support_package_callback(callback: CallbackQuery):
+@callback_route("support_package", args=1)
+async def support_package_callback(callback: CallbackQuery, package_index: int):
     """Обработчик выбора пакета поддержки"""
-    package_id = callback.data.split(":")[1]
+    if package_index >= len(PACKAGE_IDS):
+        return await respond(callback.answer("❌ Неверный формат данных!", show_alert=True))
+    package_id = PACKAGE_IDS[package_index]
     
     # Создаем инвойс для оплаты
     invoice_link = await create_stars_invoice(
@@ -298,8 +314,7 @@ async def support_package_callback(callback: CallbackQuery):
     )
     
     if not invoice_link:
-        await callback.answer("❌ Ошибка создания платежа. Попробуйте позже.", show_alert=True)
-        return
+        return await respond(callback.answer("❌ Ошибка создания платежа. Попробуйте позже.", show_alert=True))
     
     from config import STARS_PACKAGES
     package = STARS_PACKAGES[package_id]
@@ -317,18 +332,41 @@ async def support_package_callback(callback: CallbackQuery):
 
 ⚡ **Мгновенная обработка** - платеж проходит через Telegram без комиссий для вас!"""
 
-    await callback.message.edit_text(
+    run_in_background(callback.answer())
+    return await respond(callback.message.edit_text(
         text=payment_text,
         reply_markup=get_payment_keyboard(invoice_link, package_id),
         parse_mode="Markdown"
-    )
-    await callback.answer()
+    ))
+
+@router.callback_query(route_filter)
+async def callback_dispatch(callback: CallbackQuery, route):
+    """Единая точка входа для кнопок: экран определяется по коду в callback_data"""
+    if route is None:
+        return await respond(callback.answer("❌ Неверный формат данных!", show_alert=True))
+    
+    handler, args = route
+    return await handler(callback, *args)
+
+@router.inline_query()
+async def inline_query_handler(inline_query: InlineQuery):
+    """Обработчик inline запросов @bot <запрос>"""
+    offset = int(inline_query.offset) if inline_query.offset.isdigit() else 0
+    results, next_offset = get_inline_page(inline_query.query, offset)
+    
+    # Результаты одинаковы для всех, поэтому Telegram может кэшировать их сам
+    return await respond(inline_query.answer(
+        results=results,
+        cache_time=INLINE_CACHE_TIME,
+        is_personal=False,
+        next_offset=next_offset
+    ))
 
 @router.pre_checkout_query()
 async def pre_checkout_handler(pre_checkout_query: PreCheckoutQuery):
     """Обработчик pre-checkout запроса для Stars"""
     # Для Stars всегда подтверждаем платеж
-    await pre_checkout_query.answer(ok=True)
+    return await respond(pre_checkout_query.answer(ok=True))
 
 @router.message(F.successful_payment)
 async def successful_payment_handler(message: Message):
@@ -339,14 +377,15 @@ async def successful_payment_handler(message: Message):
         bot=message.bot,
         user_id=message.from_user.id,
         payload=payment.invoice_payload,
-        total_amount=payment.total_amount
+        total_amount=payment.total_amount,
+        charge_id=payment.telegram_payment_charge_id
     )
     
     if success:
         # Дополнительное сообщение с главным меню
         await message.answer(
             text="🏠 Возвращаемся в главное меню:",
-            reply_markup=get_main_menu_keyboard()
+            reply_markup=get_main_menu_markup()
         )
 
 # Команда для админа для просмотра статистики (опционально)
@@ -356,19 +395,71 @@ async def admin_command(message: Message):
     if message.from_user.id != AUTHOR_USER_ID:
         return
     
-    stats_text = get_stars_statistics_text()
-    await message.answer(
+    stats = await get_statistics()
+    stats_text = get_stars_statistics_text(
+        payments_count=stats["payments"],
+        total_stars=stats["stars"],
+        payers_count=stats["payers"],
+        package_stats=stats["packages"]
+    )
+    return await respond(message.answer(
         text=stats_text,
         parse_mode="Markdown"
-    )
+    ))
+
+@router.message(Command("slow"))
+async def slow_command(message: Message):
+    """Самые медленные недавние апдейты (только для автора)"""
+    if message.from_user.id != AUTHOR_USER_ID:
+        return
+    
+    updates = get_slow_updates()
+    if not updates:
+        return await respond(message.answer(text="🐢 Медленных апдейтов пока не было"))
+    
+    lines = ["🐢 Самые медленные апдейты:", ""]
+    for update in updates:
+        lines.append(
+            f"{update.duration * 1000:.0f} мс - {update.handler} ({update.update_type}, "
+            f"#{update.update_id}, {time.strftime('%d.%m %H:%M:%S', time.localtime(update.at))})"
+        )
+        if update.dump:
+            # Профиль содержит только время обработчика вне await
+            note = " (CPU без ожидания)" if update.dump.endswith(".prof") else ""
+            lines.append(f"    {update.dump}{note}")
+    
+    return await respond(message.answer(text="\n".join(lines)))
+
+@router.message(Command("broadcast"))
+async def broadcast_command(message: Message, command: CommandObject, broadcaster=None):
+    """Рассылка всем пользователям (только для автора).
+
+    /broadcast текст - начать, /broadcast - прогресс, /broadcast stop - остановить.
+    """
+    if message.from_user.id != AUTHOR_USER_ID or broadcaster is None:
+        return
+    
+    text = (command.args or "").strip()
+    if not text:
+        status = await broadcaster.status_text()
+    elif text == "stop":
+        status = "⏹ Рассылка остановлена" if await broadcaster.cancel() else "📣 Сейчас рассылки нет"
+    else:
+        broadcast_id = await broadcaster.create(text)
+        if broadcast_id is None:
+            status = "⚠️ Предыдущая рассылка еще идет: /broadcast - прогресс, /broadcast stop - остановить"
+        else:
+            status = f"📣 Рассылка #{broadcast_id} запущена, прогресс - /broadcast"
+    
+    return await respond(message.answer(text=status))
 
 @router.message()
 async def unknown_message(message: Message):
     """Обработчик неизвестных сообщений"""
-    await message.answer(
+    return await respond(message.answer(
         text="🤔 Не понимаю, что вы хотите. Используйте кнопки меню или команду /start",
-        reply_markup=get_main_menu_keyboard()
-    )
+        reply_markup=get_main_menu_markup()
+    ))
 
 def register_handlers(dp):
     """Регистрация всех обработчиков"""
@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiohttp import web
+from config import HEALTH_CHECK_INTERVAL, HEALTH_MAX_LOOP_LAG, HEALTH_MAX_QUEUE_FILL, HEALTH_API_STALE
+
+logger = logging.getLogger(__name__)
+
+class ApiHealthMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: время последнего успешного и неудачного запроса к Bot API"""
+
+    def __init__(self, monitor):
+        self.monitor = monitor
+
+    async def __call__(self, make_request, bot, method):
+        try:
+            result = await make_request(bot, method)
+        except Exception:
+            self.monitor.last_api_failure = time.time()
+            raise
+        self.monitor.last_api_success = time.time()
+        return result
+
+class HealthMonitor:
+    """Состояние процесса для /healthz и /readyz.
+
+    Задача в цикле событий раз в interval секунд измеряет, насколько позже
+    срока она проснулась (лаг цикла). Отдельный поток-сторож замечает, что
+    цикл заблокирован целиком, и пишет в лог стек главного потока.
+    """
+
+    def __init__(self, queue=None, interval=HEALTH_CHECK_INTERVAL, max_lag=HEALTH_MAX_LOOP_LAG,
+                 max_queue_fill=HEALTH_MAX_QUEUE_FILL, api_stale=HEALTH_API_STALE):
+        self.queue = queue
+        self.interval = interval
+        self.max_lag = max_lag
+        self.max_queue_fill = max_queue_fill
+        self.api_stale = api_stale
+        self.lag = 0.0
+        self.last_tick = time.monotonic()
+        self.last_api_success = None
+        self.last_api_failure = None
+        # Процесс останавливается: новые апдейты пусть идут другим процессам
+        self.draining = False
+        self.api_middleware = ApiHealthMiddleware(self)
+        self._task = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Запускает измерение лага и поток-сторож"""
+        self.last_tick = time.monotonic()
+        self._task = asyncio.create_task(self._measure_lag(), name="loop-lag")
+        self._thread = threading.Thread(
+            target=self._watchdog, args=(threading.main_thread().ident,), name="loop-watchdog", daemon=True
+        )
+        self._thread.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _measure_lag(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.lag = max(0.0, now - expected)
+            self.last_tick = now
+            if self.lag > self.max_lag:
+                logger.warning(f"🐌 Цикл событий отставал на {self.lag * 1000:.0f} мс")
+
+    def _watchdog(self, thread_id):
+        stalled = False
+        while not self._stop.wait(self.interval):
+            blocked = time.monotonic() - self.last_tick - self.interval
+            if blocked > self.max_lag and not stalled:
+                stalled = True
+                frame = sys._current_frames().get(thread_id)
+                stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+                logger.error(f"🧱 Цикл событий заблокирован {blocked:.1f} с, стек:\n{stack}")
+            elif blocked <= self.max_lag:
+                stalled = False
+
+    @property
+    def current_lag(self):
+        """Лаг с учетом того, что цикл может быть заблокирован прямо сейчас"""
+        return max(self.lag, time.monotonic() - self.last_tick - self.interval)
+
+    def checks(self):
+        """Проверки готовности: имя -> (пройдена, подробности)"""
+        lag = self.current_lag
+        checks = {
+            "accepting": (not self.draining, {"draining": self.draining}),
+            "event_loop": (lag <= self.max_lag, {"lag_seconds": round(lag, 4)}),
+        }
+
+        if self.queue is not None and self.queue.maxsize:
+            fill = self.queue.qsize() / self.queue.maxsize
+            checks["webhook_queue"] = (
+                fill < self.max_queue_fill,
+                {"depth": self.queue.qsize(), "size": self.queue.maxsize}
+            )
+
+        # Без запросов к API отсутствие успехов не ошибка: не готов, только если
+        # последний запрос неудачен, а успешных не было дольше api_stale
+        now = time.time()
+        failing = (
+            self.last_api_failure is not None
+            and (self.last_api_success or 0) < self.last_api_failure
+            and now - (self.last_api_success or 0) > self.api_stale
+        )
+        checks["bot_api"] = (not failing, {
+            "last_success_seconds_ago": None if self.last_api_success is None
+            else round(now - self.last_api_success, 1),
+        })
+        return checks
+
+    async def healthz(self, request):
+        """Жив ли процесс: раз цикл ответил на запрос, он работает"""
+        return web.json_response({"status": "ok", "loop_lag_seconds": round(self.current_lag, 4)})
+
+    async def readyz(self, request):
+        """Готов ли процесс принимать трафик; 503, если хоть одна проверка не пройдена"""
+        checks = self.checks()
+        ready = all(passed for passed, _ in checks.values())
+        return web.json_response(
+            {
+                "status": "ready" if ready else "not ready",
+                "checks": {name: dict(details, ok=passed) for name, (passed, details) in checks.items()},
+            },
+            status=200 if ready else 503
+        )
+
+    def setup(self, app):
+        """Маршруты /healthz и /readyz"""
+        app.router.add_get("/healthz", self.healthz)
+        app.router.add_get("/readyz", self.readyz)
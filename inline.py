@@ -0,0 +1,52 @@
+from aiogram.types import InlineQueryResultArticle, InputTextMessageContent
+from catalog import get_catalog, register_index
+from screens import render_network_text
+from keyboards import get_inline_network_keyboard
+from search import tokenize
+from cache import LRUCache
+from config import INLINE_PAGE_SIZE, INLINE_RESULTS_LIMIT, INLINE_QUERY_CACHE_SIZE
+
+def build_inline_articles(catalog):
+    """Готовые карточки inline режима для каждой нейросети (в порядке catalog.networks)"""
+    return tuple(
+        InlineQueryResultArticle(
+            id=str(network.id),
+            title=network.name,
+            description=network.description,
+            input_message_content=InputTextMessageContent(
+                message_text=render_network_text(network),
+                parse_mode="Markdown"
+            ),
+            reply_markup=get_inline_network_keyboard(network)
+        )
+        for network in catalog.networks
+    )
+
+def build_query_cache(catalog):
+    """Пустой LRU кэш результатов по запросу для нового каталога"""
+    return LRUCache(INLINE_QUERY_CACHE_SIZE)
+
+# Карточки и кэш запросов живут вместе с каталогом: при перезагрузке
+# старый кэш уходит вместе со старым каталогом
+register_index("inline_articles", build_inline_articles)
+register_index("inline_queries", build_query_cache)
+
+def get_inline_page(query, offset=0):
+    """Страница результатов inline запроса и offset следующей страницы"""
+    catalog = get_catalog()
+    cache = catalog.indexes["inline_queries"]
+    key = " ".join(tokenize(query))
+
+    results = cache.get(key)
+    if results is None:
+        articles = catalog.indexes["inline_articles"]
+        if key:
+            indexes = catalog.indexes["search"].search(key, INLINE_RESULTS_LIMIT)
+        else:
+            indexes = range(min(len(articles), INLINE_RESULTS_LIMIT))
+        results = tuple(articles[index] for index in indexes)
+        cache.put(key, results)
+
+    end = offset + INLINE_PAGE_SIZE
+    next_offset = str(end) if end < len(results) else ""
+    return list(results[offset:end]), next_offset
@@ -1,71 +1,114 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, WebAppInfo
-from data import NEURAL_NETWORKS
-from config import CATEGORY_EMOJIS
+from catalog import get_catalog, SORT_ORDERS, DEFAULT_SORT
+from config import CATEGORY_EMOJIS, CATEGORY_PAGE_SIZE
+from callbacks import encode, SORT_CODES
 
-def get_main_menu_keyboard():
+def get_main_menu_keyboard(catalog=None):
     """Создает главную клавиатуру с категориями"""
     keyboard = InlineKeyboardMarkup(inline_keyboard=[])
     
+    if catalog is None:
+        catalog = get_catalog()
+    
     # Добавляем кнопки для каждой категории
-    for category_id, category_data in NEURAL_NETWORKS.items():
-        emoji = CATEGORY_EMOJIS.get(category_id, "🔧")
-        button_text = f"{emoji} {category_data['name'].replace(emoji + ' ', '')}"
+    for category in catalog.categories:
+        emoji = CATEGORY_EMOJIS.get(category.key, "🔧")
+        button_text = f"{emoji} {category.name.replace(emoji + ' ', '')}"
         
         keyboard.inline_keyboard.append([
             InlineKeyboardButton(
                 text=button_text,
-                callback_data=f"category:{category_id}"
+                callback_data=encode("category", category.id)
             )
         ])
     
     # Добавляем кнопки помощи и информации
     keyboard.inline_keyboard.append([
-        InlineKeyboardButton(text="❓ Помощь", callback_data="help"),
-        InlineKeyboardButton(text="ℹ️ О боте", callback_data="about")
+        InlineKeyboardButton(text="❓ Помощь", callback_data=encode("help")),
+        InlineKeyboardButton(text="ℹ️ О боте", callback_data=encode("about"))
     ])
     
     return keyboard
 
-def get_category_keyboard(category_id):
-    """Создает клавиатуру для конкретной категории"""
+def get_pages_count(category):
+    """Количество страниц в категории"""
+    return max(1, -(-len(category.networks) // CATEGORY_PAGE_SIZE))
+
+def get_category_keyboard(category_id, catalog=None, sort=DEFAULT_SORT, page=0):
+    """Создает клавиатуру для страницы категории"""
     keyboard = InlineKeyboardMarkup(inline_keyboard=[])
     
-    if category_id not in NEURAL_NETWORKS:
-        return get_main_menu_keyboard()
+    if catalog is None:
+        catalog = get_catalog()
+    
+    category = catalog.category(category_id)
+    
+    if category is None or sort not in category.orders:
+        return get_main_menu_keyboard(catalog)
     
-    category_data = NEURAL_NETWORKS[category_id]
+    pages = get_pages_count(category)
+    page = min(max(page, 0), pages - 1)
+    start = page * CATEGORY_PAGE_SIZE
     
-    # Добавляем кнопки для каждой нейросети в категории
-    for network_id, network_data in category_data['networks'].items():
+    # Добавляем кнопки для нейросетей текущей страницы
+    for network in category.orders[sort][start:start + CATEGORY_PAGE_SIZE]:
         keyboard.inline_keyboard.append([
             InlineKeyboardButton(
-                text=f"🤖 {network_data['name']}",
-                callback_data=f"network:{category_id}:{network_id}"
+                text=f"🤖 {network.name}",
+                callback_data=encode("network", network.id)
             )
         ])
     
+    # Листание страниц
+    if pages > 1:
+        navigation = []
+        if page > 0:
+            navigation.append(InlineKeyboardButton(
+                text="◀️ Назад",
+                callback_data=encode("category", category.id, SORT_CODES.index(sort), page - 1)
+            ))
+        if page < pages - 1:
+            navigation.append(InlineKeyboardButton(
+                text="Вперед ▶️",
+                callback_data=encode("category", category.id, SORT_CODES.index(sort), page + 1)
+            ))
+        keyboard.inline_keyboard.append(navigation)
+    
+    # Выбор сортировки (текущая не показывается)
+    if len(category.networks) > 1:
+        keyboard.inline_keyboard.append([
+            InlineKeyboardButton(
+                text=title,
+                callback_data=encode("category", category.id, SORT_CODES.index(other_sort), 0)
+            )
+            for other_sort, (title, _) in SORT_ORDERS.items()
+            if other_sort != sort
+        ])
+    
     # Кнопка "Назад"
     keyboard.inline_keyboard.append([
-        InlineKeyboardButton(text="⬅️ Назад к категориям", callback_data="main_menu")
+        InlineKeyboardButton(text="⬅️ Назад к категориям", callback_data=encode("main_menu"))
     ])
     
     return keyboard
 
-def get_network_keyboard(category_id, network_id):
+def get_network_keyboard(category_id, network_id, catalog=None):
     """Создает клавиатуру для конкретной нейросети"""
     keyboard = InlineKeyboardMarkup(inline_keyboard=[])
     
-    if (category_id not in NEURAL_NETWORKS or 
-        network_id not in NEURAL_NETWORKS[category_id]['networks']):
-        return get_main_menu_keyboard()
+    if catalog is None:
+        catalog = get_catalog()
+    
+    network = catalog.network(category_id, network_id)
     
-    network_data = NEURAL_NETWORKS[category_id]['networks'][network_id]
+    if network is None:
+        return get_main_menu_keyboard(catalog)
     
     # Кнопка перехода на сайт нейросети
     keyboard.inline_keyboard.append([
         InlineKeyboardButton(
-            text=f"🌐 Перейти на {network_data['name']}",
-            url=network_data['url']
+            text=f"🌐 Перейти на {network.name}",
+            url=network.url
         )
     ])
     
@@ -73,14 +116,46 @@ def get_network_keyboard(category_id, network_id):
     keyboard.inline_keyboard.append([
         InlineKeyboardButton(
             text="⬅️ К нейросетям категории", 
-            callback_data=f"category:{category_id}"
+            callback_data=encode("category", network.category_id)
+        )
+    ])
+    
+    keyboard.inline_keyboard.append([
+        InlineKeyboardButton(
+            text="🏠 Главное меню", 
+            callback_data=encode("main_menu")
         )
     ])
     
+    return keyboard
+
+def get_inline_network_keyboard(network):
+    """Создает клавиатуру для карточки нейросети в inline режиме"""
+    # Только ссылка: кнопки навигации не работают в чужих чатах
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=f"🌐 Перейти на {network.name}", url=network.url)]
+    ])
+    
+    return keyboard
+
+def get_search_results_keyboard(networks):
+    """Создает клавиатуру с результатами поиска"""
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[])
+    
+    # Кнопка на каждую найденную нейросеть, эмодзи показывает категорию
+    for network in networks:
+        emoji = CATEGORY_EMOJIS.get(network.category_key, "🔧")
+        keyboard.inline_keyboard.append([
+            InlineKeyboardButton(
+                text=f"🤖 {network.name} {emoji}",
+                callback_data=encode("network", network.id)
+            )
+        ])
+    
     keyboard.inline_keyboard.append([
         InlineKeyboardButton(
             text="🏠 Главное меню", 
-            callback_data="main_menu"
+            callback_data=encode("main_menu")
         )
     ])
     
@@ -89,7 +164,7 @@ def get_network_keyboard(category_id, network_id):
 def get_help_keyboard():
     """Создает клавиатуру для раздела помощи"""
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="📂 Категории", callback_data="main_menu")],
+        [InlineKeyboardButton(text="📂 Категории", callback_data=encode("main_menu"))],
         [InlineKeyboardButton(text="👨‍💻 Связь с автором", url="https://t.me/yanparker")],
         [InlineKeyboardButton(text="⭐ Оценить бота", url="https://t.me/neirowiki_bot")]
     ])
@@ -99,9 +174,9 @@ def get_help_keyboard():
 def get_about_keyboard():
     """Создает клавиатуру для раздела 'О боте'"""
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="🔄 Обновления", callback_data="updates")],
-        [InlineKeyboardButton(text="💝 Поддержать проект", callback_data="support")],
-        [InlineKeyboardButton(text="⬅️ Назад", callback_data="main_menu")]
+        [InlineKeyboardButton(text="🔄 Обновления", callback_data=encode("updates"))],
+        [InlineKeyboardButton(text="💝 Поддержать проект", callback_data=encode("support"))],
+        [InlineKeyboardButton(text="⬅️ Назад", callback_data=encode("main_menu"))]
     ])
     
     return keyboard
\ No newline at end of file
@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import threading
+import time
+from cache import LRUCache
+from db import connect, transaction
+from config import LEDGER_PATH, PAYMENT_DEDUP_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Журнал платежей только дополняется; агрегаты обновляются в той же транзакции,
+# поэтому статистика читается без просмотра истории
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS payments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    charge_id TEXT,
+    user_id INTEGER NOT NULL,
+    package_id TEXT NOT NULL,
+    stars INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS processed_charges (
+    charge_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS payers (
+    user_id INTEGER PRIMARY KEY,
+    payments INTEGER NOT NULL,
+    stars INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS package_totals (
+    package_id TEXT PRIMARY KEY,
+    payments INTEGER NOT NULL,
+    stars INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    payments INTEGER NOT NULL,
+    stars INTEGER NOT NULL,
+    payers INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO totals (id, payments, stars, payers) VALUES (1, 0, 0, 0);
+"""
+
+_connection = None
+_lock = threading.Lock()
+
+# Быстрая проверка повторов в памяти; источник истины - processed_charges
+_seen_charges = LRUCache(PAYMENT_DEDUP_CACHE_SIZE)
+
+def get_connection():
+    """Соединение с базой журнала (WAL, общее для потоков процесса)"""
+    global _connection
+    if _connection is None:
+        _connection = connect(LEDGER_PATH, SCHEMA)
+    return _connection
+
+def _record_payment(user_id, package_id, stars, charge_id):
+    with _lock, transaction(get_connection()) as connection:
+        if charge_id is not None:
+            claimed = connection.execute(
+                "INSERT OR IGNORE INTO processed_charges (charge_id, created_at) VALUES (?, ?)",
+                (charge_id, time.time())
+            ).rowcount
+            if not claimed:
+                # Ничего не записано: транзакция завершается пустой
+                return False
+
+        connection.execute(
+            "INSERT INTO payments (charge_id, user_id, package_id, stars, created_at) VALUES (?, ?, ?, ?, ?)",
+            (charge_id, user_id, package_id, stars, time.time())
+        )
+        new_payer = connection.execute(
+            "INSERT OR IGNORE INTO payers (user_id, payments, stars) VALUES (?, 0, 0)",
+            (user_id,)
+        ).rowcount
+        connection.execute(
+            "UPDATE payers SET payments = payments + 1, stars = stars + ? WHERE user_id = ?",
+            (stars, user_id)
+        )
+        connection.execute(
+            "INSERT INTO package_totals (package_id, payments, stars) VALUES (?, 1, ?) "
+            "ON CONFLICT (package_id) DO UPDATE SET payments = payments + 1, stars = stars + excluded.stars",
+            (package_id, stars)
+        )
+        connection.execute(
+            "UPDATE totals SET payments = payments + 1, stars = stars + ?, payers = payers + ? WHERE id = 1",
+            (stars, new_payer)
+        )
+    return True
+
+async def record_payment(user_id: int, package_id: str, stars: int, charge_id: str = None):
+    """Записывает платеж в журнал и обновляет агрегаты.
+
+    Возвращает False, если платеж с таким charge_id уже обработан
+    (повторная доставка webhook или другой процесс).
+    """
+    if charge_id is not None and charge_id in _seen_charges:
+        return False
+
+    recorded = await asyncio.to_thread(_record_payment, user_id, package_id, stars, charge_id)
+    if charge_id is not None:
+        _seen_charges.put(charge_id, True)
+    return recorded
+
+def _get_statistics():
+    with _lock:
+        connection = get_connection()
+        payments, stars, payers = connection.execute(
+            "SELECT payments, stars, payers FROM totals WHERE id = 1"
+        ).fetchone()
+        packages = {
+            package_id: (package_payments, package_stars)
+            for package_id, package_payments, package_stars in connection.execute(
+                "SELECT package_id, payments, stars FROM package_totals"
+            )
+        }
+    return {
+        "payments": payments,
+        "stars": stars,
+        "payers": payers,
+        "packages": packages,
+    }
+
+async def get_statistics():
+    """Готовые агрегаты: платежи, Stars, плательщики и разбивка по пакетам"""
+    return await asyncio.to_thread(_get_statistics)
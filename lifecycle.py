@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+from handlers import drain_background_calls
+from config import SHUTDOWN_TIMEOUT, HANDOFF_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# Через эти переменные окружения новый процесс получает слушающий сокет
+# и канал, в который сообщает о готовности
+INHERIT_FD_ENV = "WEB_INHERIT_FD"
+READY_FD_ENV = "WEB_READY_FD"
+
+def inherited_socket():
+    """Слушающий сокет, переданный предыдущим процессом, или None"""
+    fd = os.environ.pop(INHERIT_FD_ENV, None)
+    if fd is None:
+        return None
+    sock = socket.socket(fileno=int(fd))
+    sock.setblocking(False)
+    logger.info(f"🔁 Слушающий сокет получен от предыдущего процесса (fd {fd})")
+    return sock
+
+def listening_socket(host, port, reuse_port=False):
+    """Новый слушающий сокет; при reuse_port порт могут слушать несколько процессов"""
+    sock = socket.create_server((host, port), backlog=128, reuse_port=reuse_port)
+    sock.setblocking(False)
+    return sock
+
+def notify_systemd(message):
+    """Сообщение systemd для Type=notify (без NOTIFY_SOCKET ничего не делает)"""
+    address = os.environ.get("NOTIFY_SOCKET")
+    if not address:
+        return
+    if address.startswith("@"):
+        address = "\0" + address[1:]
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+        sock.sendto(message.encode(), address)
+
+def notify_ready(main_process=True):
+    """Процесс принимает апдейты: сообщаем systemd и предыдущему процессу.
+
+    Воркеры режима нескольких процессов (main_process=False) systemd не пишут:
+    о готовности службы сообщает мастер.
+    """
+    # При передаче сокета главным процессом службы становится новый. Сообщаем
+    # systemd до того, как предыдущий процесс узнает о готовности и завершится,
+    # иначе его выход будет считаться остановкой службы
+    if main_process:
+        notify_systemd(f"READY=1\nMAINPID={os.getpid()}")
+    fd = os.environ.pop(READY_FD_ENV, None)
+    if fd is not None:
+        try:
+            os.write(int(fd), b"1")
+        finally:
+            os.close(int(fd))
+
+async def hand_off(sock, timeout=HANDOFF_TIMEOUT):
+    """Запускает новый процесс бота на том же слушающем сокете и ждет его готовности.
+
+    Сокет все время открыт, поэтому webhook Telegram не получает отказов.
+    True, если новый процесс готов и этот можно останавливать.
+    """
+    loop = asyncio.get_running_loop()
+    read_fd, write_fd = os.pipe()
+    env = dict(os.environ, **{INHERIT_FD_ENV: str(sock.fileno()), READY_FD_ENV: str(write_fd)})
+    try:
+        process = subprocess.Popen([sys.executable, *sys.argv], env=env, pass_fds=(sock.fileno(), write_fd))
+    except OSError as e:
+        os.close(read_fd)
+        logger.error(f"💥 Не удалось запустить новый процесс: {e}")
+        return False
+    finally:
+        os.close(write_fd)
+    logger.info(f"🔁 Запущен новый процесс (pid {process.pid}), ждем его готовности")
+
+    # Пустое чтение - новый процесс завершился, не сообщив о готовности
+    reader = loop.run_in_executor(None, os.read, read_fd, 1)
+    done, _ = await asyncio.wait({reader}, timeout=timeout)
+    if not done:
+        process.kill()
+    ready = await reader
+    os.close(read_fd)
+
+    if ready:
+        logger.info(f"🤝 Новый процесс (pid {process.pid}) принимает апдейты, останавливаемся")
+        return True
+    await loop.run_in_executor(None, process.wait)
+    logger.error(
+        f"💥 Новый процесс не стал готов за {timeout:.0f} с (код {process.returncode}), продолжаем работу"
+    )
+    return False
+
+def install_signal_handlers(stop, sock=None):
+    """SIGTERM/SIGINT запускают плавную остановку, SIGUSR2 - передачу сокета новому процессу.
+
+    Передача не включается в процессе с pid 1 (контейнер): его выход
+    останавливает контейнер вместе с новым процессом.
+    """
+    loop = asyncio.get_running_loop()
+    handing_off = False
+
+    async def handoff():
+        nonlocal handing_off
+        if handing_off or stop.is_set():
+            return
+        handing_off = True
+        try:
+            if await hand_off(sock):
+                stop.set()
+        finally:
+            handing_off = False
+
+    try:
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, stop.set)
+        if sock is not None and hasattr(signal, "SIGUSR2"):
+            if os.getpid() == 1:
+                logger.info("🔁 Процесс запущен с pid 1, перезапуск без простоя по SIGUSR2 отключен")
+            else:
+                loop.add_signal_handler(signal.SIGUSR2, lambda: asyncio.create_task(handoff()))
+                logger.info("🔁 Перезапуск без простоя по SIGUSR2 включен")
+    except NotImplementedError:
+        pass
+
+async def _drain(request_handler):
+    await request_handler.drain()
+    # Второстепенные вызовы (callback.answer и т.п.) могли запуститься последними
+    await drain_background_calls()
+
+async def drain(request_handler, scheduler, timeout=SHUTDOWN_TIMEOUT):
+    """Ждет обработки принятых апдейтов и их исходящих запросов не дольше timeout.
+
+    Запросы из очереди планировщика отправляются внутри обработки апдейтов,
+    поэтому ждать их отдельно не нужно. True, если все успело завершиться.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    logger.info(f"⏳ Дожидаемся обработки апдейтов: {request_handler.in_flight}")
+    try:
+        await asyncio.wait_for(_drain(request_handler), timeout)
+    except asyncio.TimeoutError:
+        logger.warning(
+            f"⌛ За {timeout:.0f} с не обработано апдейтов: {request_handler.in_flight}, "
+            f"в очереди исходящих запросов: {scheduler.queue_depth}"
+        )
+        await request_handler.abort()
+        return False
+    logger.info(f"✅ Все апдейты обработаны за {(loop.time() - started) * 1000:.0f} мс")
+    return True
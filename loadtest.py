@@ -0,0 +1,355 @@
+import argparse
+import asyncio
+import os
+import random
+import socket
+import sys
+import tempfile
+import time
+from collections import Counter
+from aiohttp import web, ClientSession, MultipartReader, TCPConnector
+
+# Токен и адреса подставляются в окружение до импорта модулей бота
+TOKEN = "123456:loadtest"
+os.environ.setdefault("BOT_TOKEN", TOKEN)
+
+from catalog import load_catalog
+from config import CATALOG_PATH
+from callbacks import encode
+
+# Синтетические пользователи: id = BASE_ID + номер апдейта, по нему вызовы API
+# сопоставляются с апдейтом
+BASE_ID = 10_000_000
+DEFAULT_MIX = "start=2,category=3,network=4,checkout=1,payment=1"
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(q / 100 * (len(ordered) - 1)))]
+
+class FakeBotAPI:
+    """Локальная замена api.telegram.org: отвечает на методы Bot API,
+    записывает вызовы и по желанию добавляет задержку и ответы 429"""
+
+    def __init__(self, latency=0.0, error_rate=0.0, retry_after=1):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.calls = Counter()
+        self.injected = 0
+        self.unmatched = 0
+        # Номер апдейта -> время последнего вызова API по нему
+        self.completed = {}
+        self.last_call = 0.0
+        self._message_id = 0
+
+    def create_app(self):
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        return app
+
+    async def handle(self, request):
+        method = request.match_info["method"]
+        payload = dict(await request.post())
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if self.error_rate and random.random() < self.error_rate:
+            self.injected += 1
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            })
+
+        self.record(method, payload)
+        return web.json_response({"ok": True, "result": self.result(method, payload)})
+
+    def record(self, method, payload):
+        """Учитывает вызов и отмечает, к какому апдейту он относится"""
+        now = asyncio.get_running_loop().time()
+        self.calls[method] += 1
+        self.last_call = now
+
+        target = payload.get("chat_id") or payload.get("callback_query_id") or payload.get("pre_checkout_query_id")
+        try:
+            number = int(target) - BASE_ID
+        except (TypeError, ValueError):
+            number = -1
+        if number >= 0:
+            self.completed[number] = now
+        else:
+            self.unmatched += 1
+
+    def result(self, method, payload):
+        if method == "getMe":
+            return {"id": 123456, "is_bot": True, "first_name": "Load test", "username": "loadtest_bot"}
+        if method == "getWebhookInfo":
+            return {"url": "", "has_custom_certificate": False, "pending_update_count": 0}
+        if method == "getMyCommands":
+            return []
+        if method == "createInvoiceLink":
+            return "https://t.me/$loadtest"
+        if method.startswith(("send", "edit")):
+            self._message_id += 1
+            return {
+                "message_id": self._message_id,
+                "date": int(time.time()),
+                "chat": {"id": int(payload.get("chat_id", 0)), "type": "private"},
+                "text": payload.get("text", ""),
+            }
+        return True
+
+def make_update(kind, number, catalog, run_id):
+    """Синтетический апдейт нужного типа от пользователя BASE_ID + number"""
+    user_id = BASE_ID + number
+    user = {"id": user_id, "is_bot": False, "first_name": "Load", "language_code": "ru"}
+    chat = {"id": user_id, "type": "private"}
+    now = int(time.time())
+    update = {"update_id": number + 1}
+
+    if kind == "start":
+        update["message"] = {"message_id": 1, "date": now, "chat": chat, "from": user, "text": "/start"}
+    elif kind in ("category", "network"):
+        if kind == "category":
+            data = encode("category", random.choice(catalog.categories).id)
+        else:
+            data = encode("network", random.choice(catalog.networks).id)
+        update["callback_query"] = {
+            "id": str(user_id),
+            "from": user,
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": {"message_id": 1, "date": now, "chat": chat, "text": "menu"},
+        }
+    elif kind == "checkout":
+        update["pre_checkout_query"] = {
+            "id": str(user_id),
+            "from": user,
+            "currency": "XTR",
+            "total_amount": 50,
+            "invoice_payload": f"support_small_{user_id}",
+        }
+    elif kind == "payment":
+        update["message"] = {
+            "message_id": 1,
+            "date": now,
+            "chat": chat,
+            "from": user,
+            "successful_payment": {
+                "currency": "XTR",
+                "total_amount": 50,
+                "invoice_payload": f"support_small_{user_id}",
+                "telegram_payment_charge_id": f"loadtest-{run_id}-{number}",
+                "provider_payment_charge_id": "",
+            },
+        }
+    else:
+        raise ValueError(f"Неизвестный тип апдейта: {kind}")
+    return update
+
+def parse_mix(mix):
+    kinds, weights = [], []
+    for part in mix.split(","):
+        kind, _, weight = part.partition("=")
+        kinds.append(kind.strip())
+        weights.append(float(weight or 1))
+    return kinds, weights
+
+async def start_app(env, log_path, port):
+    """Запускает main.py и ждет, пока он начнет принимать соединения"""
+    log = open(log_path, "w")
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "main.py", cwd=APP_DIR, env=env, stdout=log, stderr=log
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.returncode is not None:
+            break
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return process
+        except OSError:
+            await asyncio.sleep(0.1)
+    if process.returncode is None:
+        process.kill()
+    raise RuntimeError(f"Бот не запустился, лог: {log_path}")
+
+async def read_reply(response):
+    """Вызов API из тела ответа webhook (режим WEBHOOK_REPLY_MODE) или None"""
+    if response.content_type != "multipart/form-data":
+        await response.read()
+        return None
+    fields = {}
+    reader = MultipartReader.from_response(response)
+    async for part in reader:
+        fields[part.name] = await part.text()
+    return fields if "method" in fields else None
+
+async def send_update(session, url, api, number, update, stats):
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    stats["sent_at"][number] = started
+    try:
+        async with session.post(url, json=update) as response:
+            status = response.status
+            reply = await read_reply(response)
+    except Exception:
+        stats["errors"] += 1
+        return
+    stats["ack"].append(loop.time() - started)
+    if status != 200:
+        stats["errors"] += 1
+        stats["statuses"][status] += 1
+        return
+    if reply is not None:
+        api.record(reply.pop("method"), reply)
+
+async def fire(url, api, updates, rate, concurrency, stats):
+    """Отправляет апдейты с постоянной частотой (rate) или максимально быстро"""
+    loop = asyncio.get_running_loop()
+    connector = TCPConnector(limit=concurrency)
+    async with ClientSession(connector=connector) as session:
+        if rate > 0:
+            # Открытая модель: апдейты идут по расписанию, не дожидаясь ответов
+            tasks = []
+            started = loop.time()
+            for index, (number, update) in enumerate(updates):
+                delay = started + index / rate - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(send_update(session, url, api, number, update, stats)))
+            await asyncio.gather(*tasks)
+        else:
+            queue = iter(updates)
+
+            async def worker():
+                for number, update in queue:
+                    await send_update(session, url, api, number, update, stats)
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+async def wait_quiet(api, quiet=1.0, timeout=30.0):
+    """Ждет, пока бот перестанет обращаться к API (доработка фоновых апдейтов)"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while loop.time() < deadline and loop.time() - api.last_call < quiet:
+        await asyncio.sleep(0.1)
+
+def report(args, api, stats, count, elapsed, startup_calls):
+    latencies = [
+        api.completed[number] - sent_at
+        for number, sent_at in stats["sent_at"].items()
+        if number in api.completed
+    ]
+    finished = [api.completed[number] for number in stats["sent_at"] if number in api.completed]
+    span = (max(finished) - stats["first_sent"]) if finished else elapsed
+    calls = sum(api.calls.values()) - startup_calls
+
+    ms = lambda value: f"{value * 1000:.1f}"
+    print("📊 Результаты нагрузочного теста")
+    print(f"Апдейтов: {count} за {elapsed:.1f} с (цель {args.rate or 'максимум'} апд/с), ошибок HTTP: {stats['errors']}")
+    if stats["statuses"]:
+        print(f"Коды ответов с ошибкой: {dict(stats['statuses'])}")
+    print(
+        f"Подтверждение webhook, мс: p50 {ms(percentile(stats['ack'], 50))}, "
+        f"p95 {ms(percentile(stats['ack'], 95))}, p99 {ms(percentile(stats['ack'], 99))}"
+    )
+    print(
+        f"Полная обработка, мс: p50 {ms(percentile(latencies, 50))}, "
+        f"p95 {ms(percentile(latencies, 95))}, p99 {ms(percentile(latencies, 99))} "
+        f"({len(latencies)} апдейтов с ответом)"
+    )
+    print(f"Пропускная способность: {len(latencies) / span if span > 0 else 0:.1f} апд/с")
+    print(f"Исходящих вызовов на апдейт: {calls / count if count else 0:.2f} (не сопоставлено: {api.unmatched})")
+    print(f"Вызовы API: {dict(api.calls.most_common())}")
+    if api.injected:
+        print(f"Отдано 429: {api.injected}")
+
+async def run(args):
+    kinds, weights = parse_mix(args.mix)
+    catalog = load_catalog(os.path.join(APP_DIR, CATALOG_PATH))
+    run_id = int(time.time())
+    count = int(args.count or args.rate * args.duration)
+    updates = [
+        (number, make_update(kind, number, catalog, run_id))
+        for number, kind in enumerate(random.choices(kinds, weights, k=count))
+    ]
+
+    api = FakeBotAPI(args.api_latency / 1000, args.api_429_rate)
+    api_runner = web.AppRunner(api.create_app())
+    await api_runner.setup()
+    api_port = free_port()
+    await web.TCPSite(api_runner, "127.0.0.1", api_port).start()
+
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    port = free_port()
+    env = dict(
+        os.environ,
+        BOT_TOKEN=TOKEN,
+        TELEGRAM_API_URL=f"http://127.0.0.1:{api_port}",
+        WEBHOOK_URL=f"http://127.0.0.1:{port}/webhook",
+        WEB_HOST="127.0.0.1",
+        WEB_PORT=str(port),
+        LEDGER_PATH=os.path.join(workdir, "payments.db"),
+        STATE_PATH=os.path.join(workdir, "state.db"),
+        BROADCAST_PATH=os.path.join(workdir, "broadcast.db"),
+        PROFILE_DIR=os.path.join(workdir, "profiles"),
+        AUTHOR_USER_ID="1",
+    )
+    if not args.keep_limits:
+        # Лимиты Telegram не дают измерить самого бота
+        env.update(OUTBOUND_CHAT_RATE="1000000", OUTBOUND_CHAT_BURST="1000000", OUTBOUND_GLOBAL_RATE="1000000")
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+
+    log_path = os.path.join(workdir, "bot.log")
+    process = await start_app(env, log_path, port)
+    print(f"🚀 Бот запущен (лог: {log_path}), отправляем {count} апдейтов")
+    try:
+        await wait_quiet(api, quiet=0.5)
+        startup_calls = sum(api.calls.values())
+        api.unmatched = 0
+
+        stats = {"sent_at": {}, "ack": [], "errors": 0, "statuses": Counter()}
+        loop = asyncio.get_running_loop()
+        stats["first_sent"] = loop.time()
+        started = loop.time()
+        await fire(f"http://127.0.0.1:{port}/webhook", api, updates, args.rate, args.concurrency, stats)
+        await wait_quiet(api)
+        report(args, api, stats, count, loop.time() - started, startup_calls)
+    finally:
+        process.terminate()
+        await process.wait()
+        await api_runner.cleanup()
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Нагрузочный тест webhook: бот из main.py против локальной заглушки Bot API"
+    )
+    parser.add_argument("--rate", type=float, default=100, help="апдейтов в секунду (0 - максимально быстро)")
+    parser.add_argument("--duration", type=float, default=10, help="длительность в секундах")
+    parser.add_argument("--count", type=int, default=0, help="число апдейтов (вместо rate * duration)")
+    parser.add_argument("--concurrency", type=int, default=100, help="одновременных HTTP запросов")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"доли типов апдейтов (по умолчанию {DEFAULT_MIX})")
+    parser.add_argument("--api-latency", type=float, default=0, help="задержка ответа Bot API в мс")
+    parser.add_argument("--api-429-rate", type=float, default=0, help="доля ответов 429 от Bot API")
+    parser.add_argument("--keep-limits", action="store_true", help="не снимать лимиты исходящих запросов")
+    parser.add_argument("--env", action="append", default=[], help="переменная окружения бота KEY=VALUE")
+    args = parser.parse_args()
+    if not args.count and args.rate <= 0:
+        parser.error("при --rate 0 нужно указать --count")
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
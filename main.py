@@ -1,12 +1,37 @@
 import asyncio
 import logging
+import os
+import signal
+import time
 from aiogram import Bot, Dispatcher
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.types import BotCommand
-from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiogram.webhook.aiohttp_server import setup_application
 from aiohttp import web
-from aiohttp.web import AppRunner, TCPSite
-from handlers import register_handlers
-from config import BOT_TOKEN, BOT_NAME, WEBHOOK_URL
+from aiohttp.web import AppRunner, SockSite
+from handlers import register_handlers, router
+from catalog import get_catalog, reload_catalog, watch_catalog
+from scheduler import OutboundScheduler
+from webhook import QueuedRequestHandler, WebhookRequestHandler
+from middlewares import (
+    UpdateDeduplicationMiddleware, UpdateMetricsMiddleware, HandlerMetricsMiddleware,
+    SlowUpdateMiddleware, RecipientMiddleware
+)
+from metrics import ApiMetricsMiddleware, Gauge, require_token, render as render_metrics
+from prefork import prefork_supported, run_prefork
+from storage import create_storage
+from session import PooledSession
+import codec
+from health import HealthMonitor
+from recorder import UpdateRecorder
+from broadcast import Broadcaster
+from lifecycle import inherited_socket, listening_socket, notify_ready, install_signal_handlers, drain
+from config import (
+    BOT_TOKEN, BOT_NAME, WEBHOOK_URL, TELEGRAM_API_URL,
+    CATALOG_PATH, CATALOG_RELOAD_INTERVAL,
+    WEBHOOK_REPLY_MODE, WEBHOOK_WORKERS, WEB_HOST, WEB_PORT, WEB_PROCESSES, STATE_STORAGE,
+    API_POOL_WARMUP, METRICS_ENABLED, METRICS_TOKEN, PROFILE_THRESHOLD_MS, PROFILE_SAMPLE_RATE, RECORD_UPDATES, RECORD_PATH
+)
 
 # Настройка логирования
 logging.basicConfig(
@@ -19,6 +44,7 @@ logger = logging.getLogger(__name__)
 COMMANDS = [
     BotCommand(command="start", description="🚀 Запустить бота"),
     BotCommand(command="categories", description="📂 Показать категории"),
+    BotCommand(command="search", description="🔍 Поиск нейросети"),
     BotCommand(command="help", description="❓ Помощь"),
 ]
 
@@ -26,26 +52,133 @@ async def set_commands(bot: Bot):
     """Установка команд бота"""
     await bot.set_my_commands(COMMANDS)
 
+async def timed(timings, name, awaitable):
+    """Выполняет вызов и записывает его длительность в миллисекундах"""
+    started = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        timings[name] = (time.perf_counter() - started) * 1000
+
 async def on_startup(bot: Bot):
-    """Действия при запуске"""
-    bot_info = await bot.get_me()
+    """Действия при запуске: меняем только то, что отличается от нужного"""
+    started = time.perf_counter()
+    timings = {}
+    
+    # Текущее состояние читаем параллельно
+    bot_info, webhook_info, current_commands = await asyncio.gather(
+        timed(timings, "get_me", bot.get_me()),
+        timed(timings, "get_webhook_info", bot.get_webhook_info()),
+        timed(timings, "get_my_commands", bot.get_my_commands())
+    )
     logger.info(f"✅ Подключение к Telegram API успешно")
     logger.info(f"👤 Имя бота: @{bot_info.username}")
     logger.info(f"🆔 ID бота: {bot_info.id}")
     
-    await set_commands(bot)
-    logger.info("⌨️ Команды бота установлены")
+    changes = []
+    
+    if [(c.command, c.description) for c in current_commands] != [(c.command, c.description) for c in COMMANDS]:
+        changes.append(timed(timings, "set_my_commands", set_commands(bot)))
+    else:
+        logger.info("⌨️ Команды бота уже установлены")
+    
+    # set_webhook заменяет старый адрес сразу, без delete_webhook и потери апдейтов
+    if webhook_info.url != WEBHOOK_URL:
+        changes.append(timed(timings, "set_webhook", bot.set_webhook(WEBHOOK_URL)))
+    else:
+        logger.info(f"🔗 Webhook уже установлен: {WEBHOOK_URL}")
     
-    # Удаляем старый webhook если есть
-    await bot.delete_webhook()
-    logger.info("🗑️ Старый webhook удален")
+    if changes:
+        await asyncio.gather(*changes)
+        if "set_my_commands" in timings:
+            logger.info("⌨️ Команды бота установлены")
+        if "set_webhook" in timings:
+            logger.info(f"🔗 Webhook установлен: {WEBHOOK_URL}")
     
-    # Установка webhook
-    await bot.set_webhook(WEBHOOK_URL)
-    logger.info(f"🔗 Webhook установлен: {WEBHOOK_URL}")
+    breakdown = ", ".join(f"{name} {duration:.0f} мс" for name, duration in timings.items())
+    logger.info(f"⏱️ Startup за {(time.perf_counter() - started) * 1000:.0f} мс: {breakdown}")
 
-async def main():
+def setup_catalog_reload():
+    """Перезагрузка каталога по SIGHUP и при изменении файла"""
+    loop = asyncio.get_running_loop()
+
+    if hasattr(signal, "SIGHUP"):
+        try:
+            loop.add_signal_handler(
+                signal.SIGHUP,
+                lambda: asyncio.create_task(reload_catalog())
+            )
+            logger.info("🔄 Перезагрузка каталога по SIGHUP включена")
+        except NotImplementedError:
+            pass
+
+    if CATALOG_RELOAD_INTERVAL > 0:
+        return asyncio.create_task(watch_catalog())
+
+def create_bot():
+    """Бот с настроенным пулом соединений и адресом Bot API из TELEGRAM_API_URL"""
+    if TELEGRAM_API_URL:
+        session = PooledSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL))
+    else:
+        session = PooledSession()
+    return Bot(token=BOT_TOKEN, session=session)
+
+async def startup_only():
+    """Настройка webhook и команд без запуска сервера (для мастера)"""
+    bot = create_bot()
+    try:
+        await on_startup(bot)
+    finally:
+        await bot.session.close()
+
+def setup_dispatcher(bot):
+    """Диспетчер с хранилищем, middleware и обработчиками; планировщик подключается к сессии бота"""
+    # Состояния пользователей: кэш в памяти перед SQLite
+    storage = create_storage()
+    dp = Dispatcher(storage=storage)
+    if STATE_STORAGE == "memory" and WEB_PROCESSES > 1:
+        logger.warning("⚠️ STATE_STORAGE=memory: у каждого процесса свои состояния")
+    
+    # Все исходящие запросы идут через планировщик с лимитами Telegram
+    scheduler = OutboundScheduler()
+    bot.session.middleware(scheduler)
+    dp["scheduler"] = scheduler
+    
+    # Повторные доставки одного апдейта отсекаем до обработчиков
+    dp.update.outer_middleware(UpdateDeduplicationMiddleware())
+    
+    # Пользователи личных чатов запоминаются как получатели рассылок (/broadcast)
+    broadcaster = Broadcaster(bot)
+    dp["broadcaster"] = broadcaster
+    dp.update.outer_middleware(RecipientMiddleware(broadcaster))
+    
+    if METRICS_ENABLED:
+        # Подключается после планировщика и меряет сами запросы, без ожидания лимитов
+        bot.session.middleware(ApiMetricsMiddleware())
+        dp.update.outer_middleware(UpdateMetricsMiddleware())
+        for observer in router.observers.values():
+            observer.middleware(HandlerMetricsMiddleware())
+        Gauge("bot_outbound_queue_depth", "Запросы, ожидающие общего лимита", lambda: scheduler.queue_depth)
+        Gauge(
+            "bot_api_connections_in_use", "Занятые соединения с Bot API",
+            lambda: getattr(bot.session, "connections_in_use", 0)
+        )
+    
+    # Медленные и выборочные апдейты профилируются, список - по команде /slow
+    if PROFILE_THRESHOLD_MS > 0 or PROFILE_SAMPLE_RATE > 0:
+        profiler = SlowUpdateMiddleware()
+        for observer in router.observers.values():
+            observer.middleware(profiler)
+    
+    # Регистрируем обработчики
+    register_handlers(dp)
+    logger.info("📝 Обработчики зарегистрированы")
+    
+    return dp
+
+async def main(run_startup=True, reuse_port=False):
     """Основная функция запуска бота"""
+    boot_started = time.perf_counter()
     try:
         # Проверяем токен еще раз
         if not BOT_TOKEN:
@@ -57,35 +190,110 @@ async def main():
         logger.info(f"🚀 Запуск бота {BOT_NAME} в webhook режиме...")
         logger.info(f"🔑 Токен: {BOT_TOKEN[:10]}...{BOT_TOKEN[-10:]}")
         logger.info(f"🔗 Webhook URL: {WEBHOOK_URL}")
+        logger.info(f"🧮 JSON кодек: {codec.NAME}")
         
         # Создаем экземпляры бота и диспетчера
-        bot = Bot(token=BOT_TOKEN)
-        dp = Dispatcher()
+        bot = create_bot()
+        dp = setup_dispatcher(bot)
         
-        # Регистрируем обработчики
-        register_handlers(dp)
-        logger.info("📝 Обработчики зарегистрированы")
+        # Загружаем каталог и заранее строим все индексы и экраны
+        catalog = get_catalog()
+        logger.info(
+            f"📚 Каталог загружен из {CATALOG_PATH}: {len(catalog.categories)} категорий, "
+            f"{len(catalog.networks)} нейросетей, {len(catalog.indexes['screens'])} экранов"
+        )
+        catalog_watcher = setup_catalog_reload()
         
-        # Вызов startup
-        await on_startup(bot)
+        # Соединения с Bot API открываем заранее в каждом процессе, параллельно со startup
+        # (в режиме нескольких процессов startup делает мастер)
+        if run_startup:
+            await asyncio.gather(on_startup(bot), bot.session.warm_up(API_POOL_WARMUP))
+        else:
+            await bot.session.warm_up(API_POOL_WARMUP)
         
         # Настройка webhook
         app = web.Application()
-        SimpleRequestHandler(dispatcher=dp, bot=bot).register(app, path="/webhook")
+        if WEBHOOK_WORKERS > 0:
+            # Апдейты подтверждаются сразу и разбираются пулом воркеров
+            request_handler = QueuedRequestHandler(dispatcher=dp, bot=bot)
+            if METRICS_TOKEN:
+                app.router.add_get("/stats", require_token(
+                    lambda request: web.json_response(request_handler.stats())
+                ))
+            else:
+                logger.warning("⚠️ METRICS_TOKEN не задан, /stats не публикуется")
+            if WEBHOOK_REPLY_MODE:
+                logger.warning("⚠️ WEBHOOK_REPLY_MODE не действует вместе с WEBHOOK_WORKERS")
+        else:
+            # В режиме WEBHOOK_REPLY_MODE апдейт обрабатывается внутри запроса,
+            # чтобы ответ обработчика ушел в теле ответа на webhook
+            request_handler = WebhookRequestHandler(
+                dispatcher=dp,
+                bot=bot,
+                handle_in_background=not WEBHOOK_REPLY_MODE
+            )
+            if WEBHOOK_REPLY_MODE:
+                logger.info("↩️ Ответы отправляются в теле ответа на webhook")
+        request_handler.register(app, path="/webhook")
+        
+        # /healthz и /readyz: лаг цикла событий, очередь webhook, доступность Bot API
+        health = HealthMonitor(queue=request_handler.queue if WEBHOOK_WORKERS > 0 else None)
+        bot.session.middleware(health.api_middleware)
+        health.setup(app)
+        health.start()
+        
+        # Незавершенные рассылки продолжаются с сохраненной позиции
+        dp["broadcaster"].start()
+        
+        if METRICS_ENABLED:
+            if WEBHOOK_WORKERS > 0:
+                Gauge("bot_webhook_queue_depth", "Апдейты в очереди webhook", request_handler.queue.qsize)
+            Gauge("bot_event_loop_lag_seconds", "Отставание цикла событий", lambda: health.current_lag)
+            # Порт webhook доступен из интернета, поэтому метрики только по токену
+            if METRICS_TOKEN:
+                app.router.add_get("/metrics", require_token(
+                    lambda request: web.Response(text=render_metrics(), content_type="text/plain", charset="utf-8")
+                ))
+            else:
+                logger.warning("⚠️ METRICS_TOKEN не задан, /metrics не публикуется")
+        if RECORD_UPDATES:
+            # У каждого процесса свой файл, чтобы ротация не мешала соседям
+            path = RECORD_PATH
+            if reuse_port:
+                root, extension = os.path.splitext(RECORD_PATH)
+                path = f"{root}.{os.getpid()}{extension}"
+            UpdateRecorder(path).setup(app)
         setup_application(app, dp, bot=bot)
         
-        # Асинхронный запуск сервера
-        runner = AppRunner(app)
+        # Асинхронный запуск сервера. Активные запросы дожидаемся сами (drain),
+        # поэтому при cleanup ждать их уже не нужно
+        runner = AppRunner(app, shutdown_timeout=1)
         await runner.setup()
-        site = TCPSite(runner, "0.0.0.0", 8080)
+        # При перезапуске без простоя сокет передает предыдущий процесс.
+        # Сокет создаем сами: его же при SIGUSR2 получит следующий процесс
+        sock = inherited_socket()
+        if sock is None:
+            sock = listening_socket(WEB_HOST, WEB_PORT, reuse_port)
+        site = SockSite(runner, sock)
         await site.start()
+        notify_ready(main_process=not reuse_port)
         
-        logger.info("🤖 Бот успешно запущен в webhook режиме!")
-        logger.info("🌐 Сервер запущен на http://0.0.0.0:8080")
+        logger.info(f"🤖 Бот успешно запущен в webhook режиме за {(time.perf_counter() - boot_started) * 1000:.0f} мс!")
+        logger.info(f"🌐 Сервер запущен на http://{WEB_HOST}:{WEB_PORT}")
         logger.info("📱 Отправьте /start боту в Telegram для тестирования")
         
-        # Держим сервер живым
-        await asyncio.Event().wait()
+        # Работаем до SIGTERM/SIGINT или до передачи сокета новому процессу (SIGUSR2).
+        # В режиме нескольких процессов каждый воркер слушает порт сам, передачи нет
+        stop = asyncio.Event()
+        install_signal_handlers(stop, None if reuse_port else sock)
+        await stop.wait()
+        
+        # Плавная остановка: /readyz отвечает 503, новые соединения не принимаем,
+        # дожидаемся уже принятых апдейтов
+        logger.info("🛑 Останавливаемся...")
+        health.draining = True
+        await site.stop()
+        await asyncio.gather(drain(request_handler, dp["scheduler"]), dp["broadcaster"].stop())
         
     except Exception as e:
         logger.error(f"💥 Критическая ошибка при запуске бота: {e}")
@@ -93,7 +301,26 @@ async def main():
     finally:
         if 'runner' in locals():
             await runner.cleanup()
+        if 'health' in locals():
+            await health.stop()
+        if 'dp' in locals():
+            # Сбрасываем отложенные изменения состояний и новых получателей рассылок
+            await dp.storage.close()
+            await dp["broadcaster"].close()
         await bot.session.close()
 
+def serve_worker():
+    """Воркер в режиме нескольких процессов"""
+    asyncio.run(main(run_startup=False, reuse_port=True))
+
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    if WEB_PROCESSES > 1 and prefork_supported():
+        run_prefork(
+            startup=lambda: asyncio.run(startup_only()),
+            serve=serve_worker,
+            processes=WEB_PROCESSES
+        )
+    else:
+        if WEB_PROCESSES > 1:
+            logger.warning("⚠️ SO_REUSEPORT недоступен, запускаем один процесс")
+        asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,150 @@
+import hmac
+import os
+import time
+from bisect import bisect_left
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiohttp import web
+from config import METRICS_TOKEN
+
+# Границы корзин гистограмм в секундах
+HANDLER_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+API_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+_registry = []
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names, key, extra=""):
+    # Ключ с одной меткой - строка, с несколькими - кортеж
+    values = (key,) if len(names) == 1 else key
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    """Счетчик; значения по меткам хранятся в словаре, inc не создает объектов"""
+    __slots__ = ("name", "help", "labels", "values")
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {} if labels else {(): 0}
+        _registry.append(self)
+
+    def inc(self, key=(), amount=1):
+        values = self.values
+        values[key] = values.get(key, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for key, value in self.values.items():
+            yield f"{self.name}{_format_labels(self.labels, key)} {value}"
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами.
+
+    На каждый набор меток один раз выделяется список счетчиков корзин,
+    observe только увеличивает элемент списка.
+    """
+    __slots__ = ("name", "help", "labels", "buckets", "children")
+
+    def __init__(self, name, help, buckets, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.children = {}
+        _registry.append(self)
+
+    def observe(self, value, key=()):
+        child = self.children.get(key)
+        if child is None:
+            # Корзины, +Inf и сумма
+            child = self.children[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        child[bisect_left(self.buckets, value)] += 1
+        child[-1] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for key, child in self.children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), child):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}"
+            labels = _format_labels(self.labels, key)
+            yield f"{self.name}_sum{labels} {child[-1]}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+class Gauge:
+    """Значение, которое вычисляется функцией в момент сбора метрик"""
+    __slots__ = ("name", "help", "function")
+
+    def __init__(self, name, help, function):
+        self.name = name
+        self.help = help
+        self.function = function
+        _registry.append(self)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        yield f"{self.name} {self.function()}"
+
+def process_rss():
+    """Резидентная память процесса в байтах"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return 0
+
+def render():
+    """Все метрики в текстовом формате Prometheus"""
+    return "\n".join(line for metric in _registry for line in metric.render()) + "\n"
+
+def require_token(handler, token=METRICS_TOKEN):
+    """Служебный маршрут: отвечает только на запрос с Authorization: Bearer token, иначе 401"""
+    expected = f"Bearer {token}".encode()
+
+    async def checked(request):
+        if not hmac.compare_digest(request.headers.get("Authorization", "").encode(), expected):
+            return web.Response(status=401, headers={"WWW-Authenticate": "Bearer"})
+        return handler(request)
+    return checked
+
+UPDATES = Counter("bot_updates_total", "Входящие апдейты по типу", ("type",))
+HANDLER_LATENCY = Histogram(
+    "bot_handler_duration_seconds", "Время работы обработчика", HANDLER_BUCKETS, ("handler",)
+)
+HANDLER_ERRORS = Counter("bot_handler_errors_total", "Исключения в обработчиках", ("handler",))
+API_LATENCY = Histogram(
+    "bot_api_request_duration_seconds", "Время запроса к Bot API", API_BUCKETS, ("method",)
+)
+API_POOL_WAIT = Histogram(
+    "bot_api_pool_wait_seconds", "Ожидание свободного соединения с Bot API", HANDLER_BUCKETS
+)
+API_ERRORS = Counter("bot_api_errors_total", "Ошибки запросов к Bot API", ("method", "error"))
+BROADCAST_MESSAGES = Counter("bot_broadcast_messages_total", "Сообщения рассылок по результату", ("result",))
+RSS = Gauge("process_resident_memory_bytes", "Резидентная память процесса", process_rss)
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: время и ошибки каждого запроса к Bot API по методам"""
+
+    async def __call__(self, make_request, bot, method):
+        name = method.__api_method__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            API_ERRORS.inc((name, type(e).__name__))
+            raise
+        finally:
+            API_LATENCY.observe(time.perf_counter() - started, name)
@@ -0,0 +1,149 @@
+import asyncio
+import cProfile
+import logging
+import time
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+from metrics import UPDATES, HANDLER_LATENCY, HANDLER_ERRORS
+from profiling import capture_stack, profile_coroutine, record_update
+from config import UPDATE_DEDUP_SIZE, PROFILE_THRESHOLD_MS, PROFILE_SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+class UpdateDeduplicationMiddleware(BaseMiddleware):
+    """Отбрасывает повторно доставленные апдейты с уже виденным update_id.
+
+    Последние size id хранятся в кольцевом буфере и множестве:
+    проверка и вставка за O(1), память ограничена. При size <= 0 отсев выключен.
+    Если обработчик упал, id забывается: повторная доставка (после ответа 500
+    в режиме WEBHOOK_REPLY_MODE) будет обработана заново.
+    """
+
+    def __init__(self, size=UPDATE_DEDUP_SIZE):
+        self._ring = [None] * max(size, 0)
+        self._position = 0
+        self._seen = set()
+        self.dropped = 0
+
+    async def __call__(self, handler, event: Update, data):
+        if not self._ring:
+            return await handler(event, data)
+
+        update_id = event.update_id
+        if update_id in self._seen:
+            self.dropped += 1
+            logger.info(f"♻️ Повторный апдейт {update_id} пропущен")
+            return None
+
+        slot = self._position
+        evicted = self._ring[slot]
+        if evicted is not None:
+            self._seen.discard(evicted)
+        self._ring[slot] = update_id
+        self._seen.add(update_id)
+        self._position = (slot + 1) % len(self._ring)
+
+        try:
+            return await handler(event, data)
+        except BaseException:
+            self._seen.discard(update_id)
+            if self._ring[slot] == update_id:
+                self._ring[slot] = None
+            raise
+
+def handler_name(event, data):
+    """Имя обработчика; для кнопок - конечный обработчик, найденный route_filter"""
+    route = data.get("route")
+    callback = route[0] if route is not None else data["handler"].callback
+    return callback.__name__
+
+class RecipientMiddleware(BaseMiddleware):
+    """Запоминает пользователей личных чатов как получателей рассылок"""
+
+    def __init__(self, broadcaster):
+        self.broadcaster = broadcaster
+
+    async def __call__(self, handler, event: Update, data):
+        chat = data.get("event_chat")
+        if chat is not None and chat.type == "private":
+            self.broadcaster.add_recipient(chat.id)
+        return await handler(event, data)
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Считает входящие апдейты по типу"""
+
+    async def __call__(self, handler, event: Update, data):
+        UPDATES.inc(event.event_type)
+        return await handler(event, data)
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Время работы и исключения каждого обработчика (inner middleware роутера)"""
+
+    async def __call__(self, handler, event, data):
+        name = handler_name(event, data)
+
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(name)
+            raise
+        finally:
+            HANDLER_LATENCY.observe(time.perf_counter() - started, name)
+
+class SlowUpdateMiddleware(BaseMiddleware):
+    """Профилирование обработчиков (inner middleware роутера).
+
+    Каждый sample_rate-й апдейт выполняется под cProfile. Профилировщик включен
+    только пока выполняется сам обработчик: на время await он выключается, чтобы
+    в профиль не попали другие задачи цикла событий. Поэтому профиль показывает
+    CPU обработчика, а время ожидания сети и БД видно лишь по длительности апдейта.
+    Если обработчик работает дольше порога, в момент превышения снимается
+    цепочка await задачи. Профиль или стек сохраняются в PROFILE_DIR,
+    а апдейт попадает в список /slow. Обработчик, занявший цикл событий
+    без await, стек не даст, но в список попадет.
+    """
+
+    def __init__(self, threshold_ms=PROFILE_THRESHOLD_MS, sample_rate=PROFILE_SAMPLE_RATE):
+        self.threshold = threshold_ms / 1000
+        self.sample_rate = sample_rate
+        self._count = 0
+        # cProfile одновременно может работать только один
+        self._profiling = False
+
+    async def __call__(self, handler, event, data):
+        self._count += 1
+        profile = None
+        if self.sample_rate and self._count % self.sample_rate == 0 and not self._profiling:
+            profile = cProfile.Profile()
+
+        stack = []
+        timer = None
+        if profile is None and self.threshold > 0:
+            timer = asyncio.get_running_loop().call_later(
+                self.threshold, capture_stack, asyncio.current_task(), stack
+            )
+
+        started = time.perf_counter()
+        try:
+            if profile is not None:
+                self._profiling = True
+                return await profile_coroutine(handler(event, data), profile)
+            return await handler(event, data)
+        finally:
+            if profile is not None:
+                self._profiling = False
+            duration = time.perf_counter() - started
+            if timer is not None:
+                timer.cancel()
+
+            slow = self.threshold > 0 and duration >= self.threshold
+            if slow or profile is not None:
+                name = handler_name(event, data)
+                update = data["event_update"]
+                if slow:
+                    logger.warning(
+                        f"🐢 Медленный апдейт {update.update_id} ({update.event_type}, {name}): "
+                        f"{duration * 1000:.0f} мс"
+                    )
+                record_update(duration, name, update.event_type, update.update_id, profile, stack)
@@ -0,0 +1,122 @@
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from multiprocessing.connection import wait
+from lifecycle import notify_systemd, READY_FD_ENV
+
+logger = logging.getLogger(__name__)
+
+# Воркер, упавший быстрее этого времени после старта, перезапускается с паузой
+CRASH_LOOP_SECONDS = 5
+RESTART_DELAY = 1
+
+def prefork_supported():
+    """Можно ли делить порт между процессами через SO_REUSEPORT"""
+    return hasattr(socket, "SO_REUSEPORT") and "fork" in multiprocessing.get_all_start_methods()
+
+def _worker_main(serve, number, ready_fd):
+    # Обработчики сигналов мастера воркеру не нужны. SIGHUP игнорируется, пока
+    # serve() не поставит свой: пересланная мастером перезагрузка каталога
+    # не должна убить воркер при запуске
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    # О готовности воркер пишет в канал мастеру (lifecycle.notify_ready)
+    os.environ[READY_FD_ENV] = str(ready_fd)
+    logger.info(f"👷 Воркер {number} запущен (pid {os.getpid()})")
+    serve()
+
+def run_prefork(startup, serve, processes):
+    """Мастер: один раз выполняет startup, затем держит processes воркеров,
+    каждый из которых вызывает serve() и слушает общий порт (SO_REUSEPORT).
+
+    Упавшие воркеры перезапускаются, SIGHUP пересылается воркерам,
+    SIGTERM/SIGINT останавливают всех. systemd получает READY=1, когда
+    каждый из processes воркеров хотя бы раз сообщил, что слушает порт.
+    """
+    context = multiprocessing.get_context("fork")
+    workers = {}
+    started_at = {}
+    # Каналы готовности: read fd -> номер воркера, еще не ответившего
+    ready_pipes = {}
+    ready = set()
+    stopping = False
+
+    def spawn(number):
+        read_fd, write_fd = os.pipe()
+        process = context.Process(
+            target=_worker_main, args=(serve, number, write_fd), name=f"worker-{number}"
+        )
+        try:
+            process.start()
+        finally:
+            os.close(write_fd)
+        ready_pipes[read_fd] = number
+        workers[number] = process
+        started_at[number] = time.monotonic()
+
+    def check_ready(fd):
+        # Пустое чтение - воркер завершился, не сообщив о готовности
+        number = ready_pipes.pop(fd)
+        reported = os.read(fd, 1)
+        os.close(fd)
+        if not reported or number in ready:
+            return
+        ready.add(number)
+        if len(ready) == processes:
+            logger.info(f"✅ Все воркеры ({processes}) принимают апдейты")
+            # Главный процесс службы - мастер, воркеры о готовности systemd не сообщают
+            notify_systemd("READY=1")
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for process in workers.values():
+            if process.is_alive():
+                process.terminate()
+
+    def forward_hup(signum, frame):
+        for process in workers.values():
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGHUP)
+
+    # SIGHUP во время startup тоже не должен завершать мастер
+    signal.signal(signal.SIGHUP, forward_hup)
+
+    # Webhook и команды настраивает только мастер
+    startup()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for number in range(processes):
+        spawn(number)
+
+    logger.info(f"🧩 Мастер (pid {os.getpid()}) запустил {processes} воркеров")
+
+    while not stopping:
+        sentinels = [process.sentinel for process in workers.values()]
+        for fd in wait(sentinels + list(ready_pipes), timeout=1):
+            if fd in ready_pipes:
+                check_ready(fd)
+        if stopping:
+            break
+
+        for number, process in list(workers.items()):
+            if process.is_alive():
+                continue
+            process.join()
+            logger.error(f"💥 Воркер {number} завершился с кодом {process.exitcode}, перезапускаем")
+            if time.monotonic() - started_at[number] < CRASH_LOOP_SECONDS:
+                time.sleep(RESTART_DELAY)
+            if not stopping:
+                spawn(number)
+
+    for process in workers.values():
+        process.join()
+    for fd in ready_pipes:
+        os.close(fd)
+    logger.info("🛑 Все воркеры остановлены")
@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+import types
+from collections import deque, namedtuple
+from config import PROFILE_DIR, PROFILE_KEEP
+
+logger = logging.getLogger(__name__)
+
+# Сколько последних медленных апдейтов помнить для команды /slow
+RECENT_LIMIT = 200
+
+SlowUpdate = namedtuple("SlowUpdate", ["duration", "handler", "update_type", "update_id", "at", "dump"])
+
+_recent = deque(maxlen=RECENT_LIMIT)
+_rotate_lock = threading.Lock()
+_writes = set()
+
+def capture_stack(task, lines):
+    """Снимает цепочку await задачи: где именно она сейчас ждет"""
+    awaitable = task.get_coro()
+    while awaitable is not None:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None)
+        if frame is None:
+            lines.append(f"  awaiting {awaitable!r}")
+            break
+        lines.append(f'  File "{frame.f_code.co_filename}", line {frame.f_lineno}, in {frame.f_code.co_name}')
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None)
+
+@types.coroutine
+def profile_coroutine(coro, profile):
+    """Выполняет корутину, включая profile только на ее синхронных участках.
+
+    Пока корутина ждет в await, профилировщик выключен: цикл событий в это время
+    выполняет другие задачи, и их вызовы в профиль не попадают.
+    """
+    value, error = None, None
+    while True:
+        profile.enable()
+        try:
+            if error is None:
+                awaiting = coro.send(value)
+            else:
+                awaiting = coro.throw(error)
+        except StopIteration as stop:
+            return stop.value
+        finally:
+            profile.disable()
+
+        try:
+            value, error = (yield awaiting), None
+        except BaseException as e:
+            value, error = None, e
+
+def _write_dump(path, profile, stack):
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        if profile is not None:
+            profile.dump_stats(path)
+        else:
+            with open(path, "w", encoding="utf-8") as dump:
+                dump.write("\n".join(stack) + "\n")
+    except OSError as e:
+        logger.error(f"Не удалось сохранить дамп {path}: {e}")
+        return
+
+    # Храним только PROFILE_KEEP последних дампов
+    with _rotate_lock:
+        dumps = sorted(
+            (entry for entry in os.scandir(PROFILE_DIR) if entry.is_file()),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in dumps[:-PROFILE_KEEP]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+def record_update(duration, handler, update_type, update_id, profile=None, stack=None):
+    """Запоминает апдейт и сохраняет его профиль (.prof) или стек (.txt) в каталог дампов"""
+    dump = None
+    if profile is not None or stack:
+        name = (
+            f"{time.strftime('%Y%m%d-%H%M%S')}_{update_id}_{update_type}_{handler}"
+            f"_{duration * 1000:.0f}ms{'.prof' if profile is not None else '.txt'}"
+        )
+        dump = os.path.join(PROFILE_DIR, name)
+        task = asyncio.create_task(asyncio.to_thread(_write_dump, dump, profile, stack))
+        _writes.add(task)
+        task.add_done_callback(_writes.discard)
+
+    _recent.append(SlowUpdate(duration, handler, update_type, update_id, time.time(), dump))
+
+def get_slow_updates(limit=10):
+    """Самые медленные из недавно записанных апдейтов"""
+    return sorted(_recent, key=lambda update: update.duration, reverse=True)[:limit]
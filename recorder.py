@@ -0,0 +1,105 @@
+import hashlib
+import logging
+import os
+import queue
+import re
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from aiohttp import web
+import codec
+from config import RECORD_PATH, RECORD_MAX_BYTES, RECORD_BACKUPS, RECORD_SALT
+
+logger = logging.getLogger(__name__)
+
+# Объекты с данными пользователя или чата: id заменяется псевдонимом, имена убираются
+PERSON_KEYS = {"from", "chat", "user", "sender_chat", "forward_from", "forward_from_chat", "via_bot"}
+PERSONAL_FIELDS = ("first_name", "last_name", "username", "title", "phone_number", "bio")
+ID_KEYS = {"user_id", "chat_id"}
+CHARGE_KEYS = {"telegram_payment_charge_id", "provider_payment_charge_id"}
+# id пользователя внутри payload инвойса (support_{package}_{user_id})
+PAYLOAD_ID = re.compile(r"\d{5,}")
+
+class UpdateRecorder:
+    """Пишет тела апдейтов с /webhook в JSONL с ротацией.
+
+    id пользователей и чатов заменяются псевдонимами (один пользователь -
+    один псевдоним в пределах ключа), имена удаляются. Запись на диск идет
+    в отдельном потоке через очередь логирования.
+    """
+
+    def __init__(self, path=RECORD_PATH, max_bytes=RECORD_MAX_BYTES,
+                 backups=RECORD_BACKUPS, salt=RECORD_SALT, route="/webhook"):
+        self.path = path
+        self.route = route
+        self._key = hashlib.sha256(salt.encode()).digest()[:16]
+        self._queue = queue.SimpleQueue()
+        self._logger = logging.getLogger(f"{__name__}.updates")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._logger.addHandler(QueueHandler(self._queue))
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        file_handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+        file_handler.setFormatter(logging.Formatter("%(message)s"))
+        self._listener = QueueListener(self._queue, file_handler)
+        self.recorded = 0
+
+    def pseudonym(self, value):
+        """Стабильный псевдоним для id (знак сохраняется: у групп id отрицательные)"""
+        digest = hashlib.blake2b(str(abs(value)).encode(), key=self._key, digest_size=6).digest()
+        pseudonym = int.from_bytes(digest, "big")
+        return -pseudonym if value < 0 else pseudonym
+
+    def anonymize(self, value, key=None):
+        if isinstance(value, dict):
+            if key in PERSON_KEYS:
+                value = {
+                    field: item for field, item in value.items() if field not in PERSONAL_FIELDS
+                }
+                if isinstance(value.get("id"), int):
+                    value["id"] = self.pseudonym(value["id"])
+                if "first_name" not in value and value.get("type", "private") == "private":
+                    value["first_name"] = "User"
+            return {field: self.anonymize(item, field) for field, item in value.items()}
+        if isinstance(value, list):
+            return [self.anonymize(item) for item in value]
+        if key in ID_KEYS and isinstance(value, int):
+            return self.pseudonym(value)
+        if key in CHARGE_KEYS and isinstance(value, str) and value:
+            return hashlib.blake2b(value.encode(), key=self._key, digest_size=12).hexdigest()
+        if key == "invoice_payload" and isinstance(value, str):
+            return PAYLOAD_ID.sub(lambda match: str(self.pseudonym(int(match.group()))), value)
+        return value
+
+    def record(self, body):
+        """Записывает тело одного апдейта"""
+        try:
+            update = codec.loads(body)
+        except ValueError:
+            return
+        line = codec.dumps({"t": time.time(), "update": self.anonymize(update)})
+        self._logger.info(line)
+        self.recorded += 1
+
+    @web.middleware
+    async def middleware(self, request, handler):
+        if request.path == self.route and request.method == "POST":
+            # Тело кэшируется aiohttp, обработчик webhook прочитает его снова
+            self.record(await request.read())
+        return await handler(request)
+
+    def setup(self, app):
+        """Подключает запись к приложению aiohttp"""
+        app.middlewares.append(self.middleware)
+        app.on_startup.append(self._start)
+        app.on_cleanup.append(self._stop)
+
+    async def _start(self, app):
+        self._listener.start()
+        logger.info(f"📼 Запись апдейтов в {self.path}")
+
+    async def _stop(self, app):
+        self._listener.stop()
+        logger.info(f"📼 Записано апдейтов: {self.recorded}")
@@ -0,0 +1,153 @@
+import argparse
+import asyncio
+import glob
+import logging
+import os
+import tempfile
+from collections import Counter
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import TelegramMethod
+
+# Модули бота читают настройки при импорте, поэтому импортируются
+# только после prepare_environment()
+
+def prepare_environment():
+    """Настройки по умолчанию: воспроизведение не должно трогать рабочие базы
+    и упираться в лимиты Telegram. Заданные в окружении значения не меняются."""
+    workdir = tempfile.mkdtemp(prefix="replay-")
+    defaults = {
+        "BOT_TOKEN": "123456:replay",
+        "STATE_STORAGE": "memory",
+        "LEDGER_PATH": os.path.join(workdir, "payments.db"),
+        "BROADCAST_PATH": os.path.join(workdir, "broadcast.db"),
+        "PROFILE_DIR": os.path.join(workdir, "profiles"),
+        "OUTBOUND_CHAT_RATE": "1000000",
+        "OUTBOUND_CHAT_BURST": "1000000",
+        "OUTBOUND_GLOBAL_RATE": "1000000",
+    }
+    for key, value in defaults.items():
+        os.environ.setdefault(key, value)
+
+class StubSession(BaseSession):
+    """Сессия бота без сети: отвечает на методы как заглушка Bot API и считает вызовы"""
+
+    def __init__(self):
+        import codec
+        from loadtest import FakeBotAPI
+
+        super().__init__(json_loads=codec.loads, json_dumps=codec.dumps)
+        self.calls = Counter()
+        self._api = FakeBotAPI()
+
+    async def make_request(self, bot, method, timeout=None):
+        name = method.__api_method__
+        self.calls[name] += 1
+        payload = {"chat_id": getattr(method, "chat_id", None) or 0, "text": getattr(method, "text", None) or ""}
+        content = self.json_dumps({"ok": True, "result": self._api.result(name, payload)})
+        return self.check_response(bot=bot, method=method, status_code=200, content=content)
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        """Содержимое файлов в запись не попадает: скачивание дает пустой файл"""
+        self.calls["download"] += 1
+        yield b""
+
+    async def close(self):
+        pass
+
+def read_records(patterns):
+    """Записи из файлов по порядку времени (ротированные файлы тоже)"""
+    import codec
+
+    paths = sorted({path for pattern in patterns for path in glob.glob(pattern)})
+    records = []
+    for path in paths:
+        with open(path, encoding="utf-8") as recording:
+            for line in recording:
+                if line.strip():
+                    records.append(codec.loads(line))
+    records.sort(key=lambda record: record["t"])
+    return records
+
+async def replay(records, speed, concurrency):
+    from main import setup_dispatcher
+
+    session = StubSession()
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=session)
+    dp = setup_dispatcher(bot)
+    # Лог каждого апдейта заметно искажает замер
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("aiogram.event").setLevel(logging.WARNING)
+
+    loop = asyncio.get_running_loop()
+    durations = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def feed(update):
+        async with semaphore:
+            started = loop.time()
+            try:
+                result = await dp.feed_raw_update(bot, update)
+            except Exception as e:
+                logging.getLogger(__name__).error(f"Ошибка апдейта {update.get('update_id')}: {e}")
+                return
+            durations.append(loop.time() - started)
+            # В режиме WEBHOOK_REPLY_MODE ответ возвращается, а не отправляется
+            if isinstance(result, TelegramMethod):
+                session.calls[result.__api_method__] += 1
+
+    tasks = []
+    started = loop.time()
+    first = records[0]["t"]
+    for record in records:
+        if speed:
+            delay = started + (record["t"] - first) / speed - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(feed(record["update"])))
+    await asyncio.gather(*tasks)
+
+    # Дожидаемся фоновых вызовов (callback.answer и т.п.)
+    deadline = loop.time() + 10
+    while len(asyncio.all_tasks()) > 1 and loop.time() < deadline:
+        await asyncio.sleep(0.01)
+    elapsed = loop.time() - started
+
+    await dp.storage.close()
+    await dp["broadcaster"].close()
+    await bot.session.close()
+    return durations, session.calls, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Воспроизведение записанных апдейтов через диспетчер бота без сети"
+    )
+    parser.add_argument("paths", nargs="+", help="файлы записи (можно шаблоном, например 'recordings/*.jsonl*')")
+    parser.add_argument("--speed", default="1", help="1 - как в записи, N - в N раз быстрее, max - без пауз")
+    parser.add_argument("--concurrency", type=int, default=100, help="одновременно обрабатываемых апдейтов")
+    args = parser.parse_args()
+    prepare_environment()
+    from loadtest import percentile
+
+    speed = 0 if args.speed == "max" else float(args.speed)
+
+    records = read_records(args.paths)
+    if not records:
+        parser.error("записей не найдено")
+
+    durations, calls, elapsed = asyncio.run(replay(records, speed, args.concurrency))
+
+    types = Counter(next(key for key in record["update"] if key != "update_id") for record in records)
+    ms = lambda value: f"{value * 1000:.2f}"
+    print("📼 Результаты воспроизведения")
+    print(f"Апдейтов: {len(records)} ({dict(types.most_common())}), скорость: {args.speed}")
+    print(f"Время: {elapsed:.2f} с, {len(durations) / elapsed if elapsed else 0:.1f} апд/с, ошибок: {len(records) - len(durations)}")
+    print(
+        f"Обработка апдейта, мс: p50 {ms(percentile(durations, 50))}, "
+        f"p95 {ms(percentile(durations, 95))}, p99 {ms(percentile(durations, 99))}"
+    )
+    print(f"Вызовов API на апдейт: {sum(calls.values()) / len(records):.2f}")
+    print(f"Вызовы API: {dict(calls.most_common())}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import asyncio
+import heapq
+import itertools
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+from cache import LRUCache
+from config import (
+    OUTBOUND_CHAT_RATE,
+    OUTBOUND_CHAT_BURST,
+    OUTBOUND_GLOBAL_RATE,
+    OUTBOUND_MAX_RETRIES
+)
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты исходящих запросов: меньше - раньше
+INTERACTIVE = 0
+NOTIFICATION = 1
+
+# Сколько чатов помнить для лимитов (старые вытесняются)
+CHAT_BUCKETS_LIMIT = 10000
+
+_priority = ContextVar("outbound_priority", default=INTERACTIVE)
+
+@contextmanager
+def outbound_priority(priority):
+    """Задает приоритет исходящих запросов внутри блока with"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+class TokenBucket:
+    """Token bucket с резервированием: токены могут уходить в минус"""
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, now):
+        """Забирает токен и возвращает, сколько секунд ждать до его появления"""
+        self._refill(now)
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self):
+        """Возвращает зарезервированный токен, если запрос так и не ушел"""
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def try_take(self, now):
+        """Забирает токен, только если он есть прямо сейчас"""
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def pause(self, seconds, now):
+        """Запрещает отправку на seconds секунд (после 429 от Telegram)"""
+        self._refill(now)
+        # Следующее резервирование будет ждать ровно seconds
+        self.tokens = min(self.tokens, 1) - seconds * self.rate
+
+class OutboundScheduler(BaseRequestMiddleware):
+    """Middleware сессии бота: лимиты на чат и общий, приоритеты и повтор после 429"""
+
+    def __init__(self, chat_rate=OUTBOUND_CHAT_RATE, chat_burst=OUTBOUND_CHAT_BURST,
+                 global_rate=OUTBOUND_GLOBAL_RATE, max_retries=OUTBOUND_MAX_RETRIES):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._global = TokenBucket(global_rate, global_rate, 0.0)
+        self._chats = LRUCache(CHAT_BUCKETS_LIMIT)
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._pump_task = None
+        self.retries = 0
+
+    @property
+    def queue_depth(self):
+        """Сколько запросов ждут общего лимита"""
+        return len(self._waiting)
+
+    def _chat_bucket(self, chat_id, now):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate, self.chat_burst, now)
+            self._chats.put(chat_id, bucket)
+        return bucket
+
+    async def _acquire_global(self, priority, loop):
+        # Быстрый путь: очереди нет и токен есть
+        if not self._waiting and self._global.try_take(loop.time()):
+            return
+
+        future = loop.create_future()
+        heapq.heappush(self._waiting, (priority, next(self._sequence), future))
+        if self._pump_task is None:
+            self._pump_task = asyncio.create_task(self._pump())
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Токен уже выдан, но задачу отменили до отправки запроса
+            if future.done() and not future.cancelled():
+                self._global.refund()
+            raise
+
+    async def _pump(self):
+        """Выдает общие токены ожидающим в порядке приоритета"""
+        loop = asyncio.get_running_loop()
+        try:
+            while self._waiting:
+                delay = self._global.reserve(loop.time())
+                if delay:
+                    await asyncio.sleep(delay)
+                while self._waiting:
+                    _, _, future = heapq.heappop(self._waiting)
+                    if not future.done():
+                        future.set_result(None)
+                        break
+                else:
+                    # Все дождавшиеся отменены: токен никому не достался
+                    self._global.refund()
+        finally:
+            self._pump_task = None
+
+    async def __call__(self, make_request, bot, method):
+        loop = asyncio.get_running_loop()
+        # Лимит на чат действует для методов с chat_id, общий - для всех
+        # (answerCallbackQuery, answerInlineQuery и другие тоже расходуют его)
+        chat_id = getattr(method, "chat_id", None)
+        priority = _priority.get()
+
+        for attempt in range(self.max_retries + 1):
+            chat_bucket = None
+            if chat_id is not None:
+                chat_bucket = self._chat_bucket(chat_id, loop.time())
+            try:
+                if chat_bucket is not None:
+                    delay = chat_bucket.reserve(loop.time())
+                    if delay:
+                        await asyncio.sleep(delay)
+                await self._acquire_global(priority, loop)
+            except asyncio.CancelledError:
+                # Запрос не уйдет: токен чата возвращаем
+                if chat_bucket is not None:
+                    chat_bucket.refund()
+                raise
+
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                self.retries += 1
+                logger.warning(
+                    f"⏳ 429 на {type(method).__name__} (чат {chat_id}), "
+                    f"повтор через {e.retry_after} с"
+                )
+                if chat_id is not None:
+                    # Ожидание случится при следующем резервировании токена чата
+                    self._chat_bucket(chat_id, loop.time()).pause(e.retry_after, loop.time())
+                else:
+                    await asyncio.sleep(e.retry_after)
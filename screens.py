@@ -0,0 +1,148 @@
+from collections import namedtuple
+from catalog import get_catalog, register_index, SORT_ORDERS, DEFAULT_SORT
+from keyboards import (
+    get_pages_count,
+    get_main_menu_keyboard,
+    get_category_keyboard,
+    get_network_keyboard,
+    get_about_keyboard
+)
+from config import BOT_NAME
+
+# Готовый экран: текст сообщения и клавиатура к нему
+Screen = namedtuple("Screen", ["text", "keyboard"])
+
+def render_main_menu_text(categories_count, networks_count):
+    """Шаблон главного меню (дата подставляется в обработчике)"""
+    return f"""🏠 **Главное меню - {BOT_NAME}**
+
+📊 **Статистика бота:**
+• {categories_count} категорий нейросетей
+• {networks_count} ИИ в базе данных
+• Актуальная информация на {{date}}
+
+Выберите категорию для изучения доступных нейросетей:"""
+
+def render_categories_text(catalog):
+    """Текст списка категорий для команды /categories"""
+    categories_text = "📂 **Доступные категории нейросетей:**\n\n"
+
+    for category in catalog.categories:
+        networks_count = len(category.networks)
+        categories_text += f"• {category.name} ({networks_count} нейросетей)\n"
+        categories_text += f"  _{category.description}_\n\n"
+
+    categories_text += "Выберите категорию для просмотра доступных нейросетей:"
+    return categories_text
+
+def render_about_text(categories_count, networks_count):
+    """Текст раздела 'О боте'"""
+    return f"""ℹ️ **О боте {BOT_NAME}**
+
+🎯 **Миссия:** Упростить выбор подходящей нейросети для любых задач.
+
+📊 **Актуальная статистика:**
+• Категорий: {categories_count}
+• Нейросетей в базе: {networks_count}
+• Последнее обновление: Январь 2025
+
+⚡ **Особенности:**
+• Актуальные цены и возможности
+• Подробные описания каждой ИИ
+• Прямые ссылки на официальные сайты
+• Регулярные обновления базы данных
+• Простая навигация и поиск
+
+🔄 **Обновления:**
+Информация о нейросетях обновляется каждый месяц для поддержания актуальности данных о ценах и возможностях.
+
+💝 **Поддержка проекта:**
+Если бот полезен для вас, поделитесь им с друзьями и коллегами!"""
+
+def render_category_text(category, sort=DEFAULT_SORT, page=0, pages=1):
+    """Текст экрана (страницы) категории"""
+    page_text = ""
+    if pages > 1:
+        page_text = f"\n📄 Страница {page + 1} из {pages} · {SORT_ORDERS[sort][0]}\n"
+    elif sort != DEFAULT_SORT:
+        page_text = f"\n📄 {SORT_ORDERS[sort][0]}\n"
+
+    return f"""📂 **{category.name}**
+
+📝 _{category.description}_
+
+🤖 **Доступно нейросетей:** {len(category.networks)}
+{page_text}
+Выберите интересующую вас нейросеть для получения подробной информации:"""
+
+def render_network_text(network):
+    """Текст экрана нейросети"""
+    return f"""🤖 **{network.name}**
+
+📋 **Описание:**
+{network.description}
+
+🆓 **Бесплатные возможности:**
+{network.free_features}
+
+⚠️ **Ограничения бесплатной версии:**
+{network.limitations}
+
+💰 **Стоимость подписки:**
+{network.pricing}
+
+🔗 Нажмите кнопку ниже, чтобы перейти на официальный сайт."""
+
+def build_screens(catalog):
+    """Отрисовывает все экраны каталога по ключу (screen, category_id, network_id)"""
+    categories_count = len(catalog.categories)
+    networks_count = len(catalog.networks)
+    main_menu_keyboard = get_main_menu_keyboard(catalog)
+
+    screens = {
+        ("main_menu", None, None): Screen(
+            render_main_menu_text(categories_count, networks_count),
+            main_menu_keyboard
+        ),
+        ("categories", None, None): Screen(
+            render_categories_text(catalog),
+            main_menu_keyboard
+        ),
+        ("about", None, None): Screen(
+            render_about_text(categories_count, networks_count),
+            get_about_keyboard()
+        ),
+    }
+
+    for category in catalog.categories:
+        # Каждая страница при каждой сортировке: ключ (sort, page)
+        pages = get_pages_count(category)
+        for sort in SORT_ORDERS:
+            for page in range(pages):
+                screens[("category", category.key, (sort, page))] = Screen(
+                    render_category_text(category, sort, page, pages),
+                    get_category_keyboard(category.key, catalog, sort, page)
+                )
+        screens[("category", category.key, None)] = screens[("category", category.key, (DEFAULT_SORT, 0))]
+
+        for network in category.networks:
+            screens[("network", category.key, network.key)] = Screen(
+                render_network_text(network),
+                get_network_keyboard(category.key, network.key, catalog)
+            )
+
+    return screens
+
+# Экраны перестраиваются вместе с каталогом и подменяются вместе с ним
+register_index("screens", build_screens)
+
+def get_screen(screen, category_id=None, item=None):
+    """Возвращает готовый экран из кэша или None, если такого нет.
+
+    item - id нейросети для экрана "network" или (sort, page) для "category".
+    """
+    return get_catalog().indexes["screens"].get((screen, category_id, item))
+
+def get_main_menu_markup():
+    """Закэшированная клавиатура главного меню"""
+    return get_screen("main_menu").keyboard
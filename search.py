@@ -0,0 +1,271 @@
+import heapq
+import re
+from bisect import bisect_left
+from itertools import combinations
+from catalog import get_catalog, register_index
+from cache import LRUCache
+
+# Поля карточки, по которым ищем, и их вес в ранжировании
+SEARCH_FIELDS = {
+    "name": 5.0,
+    "description": 2.0,
+    "free_features": 1.0,
+    "pricing": 1.0,
+}
+
+# Множители для точного совпадения, префикса и опечатки
+EXACT_WEIGHT = 1.0
+PREFIX_WEIGHT = 0.7
+FUZZY_WEIGHT = 0.4
+
+# Сколько слов словаря проверяем по префиксу одного слова запроса
+MAX_PREFIX_TERMS = 50
+
+# Сколько разных слов запроса учитываем и для скольких слов храним готовые списки
+MAX_QUERY_WORDS = 8
+TOKEN_CACHE_SIZE = 1024
+
+# Сколько строк каждого списка читаем до первой проверки границы
+TOP_FIRST_STEP = 8
+
+SEARCH_LIMIT = 10
+
+_token_re = re.compile(r"\w+")
+
+def tokenize(text):
+    """Разбивает текст на слова в нижнем регистре"""
+    return _token_re.findall(text.lower().replace("ё", "е"))
+
+def trigrams(token):
+    """Триграммы слова с границами"""
+    padded = f" {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def max_typos(token):
+    """Допустимое число опечаток для слова запроса"""
+    if len(token) < 4:
+        return 0
+    return 1 if len(token) < 8 else 2
+
+def edit_distance(a, b, limit):
+    """Расстояние Дамерау-Левенштейна с ранним выходом, если оно больше limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    before_previous = None
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            distance = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b)
+            )
+            # Перестановка соседних букв считается одной опечаткой
+            if i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                distance = min(distance, before_previous[j - 2] + 1)
+            current.append(distance)
+        # Дальше расстояние только растет (перестановка смотрит на две строки назад)
+        if min(current) > limit and min(previous) >= limit:
+            return limit + 1
+        before_previous, previous = previous, current
+    return previous[-1]
+
+class SearchIndex:
+    """Инвертированный индекс по карточкам нейросетей.
+
+    Для каждого слова хранятся веса карточек и те же карточки по убыванию
+    веса. Поиск не обходит списки частых слов целиком: группы карточек по
+    числу найденных слов запроса отбираются операциями над множествами,
+    а лучшие по весу внутри группы - обходом списков сверху с остановом,
+    как только первые limit известны (threshold algorithm).
+    """
+    __slots__ = ("postings", "ranked", "terms", "trigram_index", "tokens")
+
+    def __init__(self, catalog):
+        postings = {}
+        for network in catalog.networks:
+            for field, weight in SEARCH_FIELDS.items():
+                for token in tokenize(getattr(network, field)):
+                    scores = postings.setdefault(token, {})
+                    scores[network.index] = scores.get(network.index, 0.0) + weight
+
+        trigram_index = {}
+        for token in postings:
+            for trigram in trigrams(token):
+                trigram_index.setdefault(trigram, []).append(token)
+
+        # Слово -> {позиция нейросети в catalog.networks: вес}, отсортированный словарь и триграммы
+        self.postings = postings
+        self.ranked = {term: _ranked(scores) for term, scores in postings.items()}
+        self.terms = sorted(postings)
+        self.trigram_index = trigram_index
+        # Слово запроса -> его списки (раскрытие по префиксам и опечаткам уже учтено)
+        self.tokens = LRUCache(TOKEN_CACHE_SIZE)
+
+    def expand(self, token):
+        """Слова словаря, подходящие под слово запроса, с множителями"""
+        if token in self.postings:
+            matches = {token: EXACT_WEIGHT}
+        else:
+            matches = {}
+
+        # Префиксы: диапазон в отсортированном словаре
+        position = bisect_left(self.terms, token)
+        for term in self.terms[position:position + MAX_PREFIX_TERMS]:
+            if not term.startswith(token):
+                break
+            matches.setdefault(term, PREFIX_WEIGHT)
+
+        if matches:
+            return matches
+
+        # Опечатки: кандидаты по общим триграммам, проверка расстоянием
+        limit = max_typos(token)
+        if not limit:
+            return matches
+
+        query_trigrams = trigrams(token)
+        shared = {}
+        for trigram in query_trigrams:
+            for term in self.trigram_index.get(trigram, ()):
+                shared[term] = shared.get(term, 0) + 1
+
+        threshold = max(1, len(query_trigrams) - 3 * limit)
+        for term, count in shared.items():
+            if count >= threshold and edit_distance(token, term, limit) <= limit:
+                matches[term] = FUZZY_WEIGHT
+
+        return matches
+
+    def token_postings(self, token):
+        """Списки слова запроса: (карточки по убыванию веса, веса, множитель, множество карточек).
+
+        Пустой кортеж, если слово не найдено. Если слово раскрывается в несколько
+        слов словаря, их веса складываются в один список, чтобы граница веса
+        при обходе оставалась точной.
+        """
+        entry = self.tokens.get(token)
+        if entry is not None:
+            return entry
+
+        matches = self.expand(token)
+        if not matches:
+            entry = ()
+        elif len(matches) == 1:
+            (term, multiplier), = matches.items()
+            scores = self.postings[term]
+            entry = (self.ranked[term], scores, multiplier, frozenset(scores))
+        else:
+            scores = {}
+            for term, multiplier in matches.items():
+                for index, weight in self.postings[term].items():
+                    scores[index] = scores.get(index, 0.0) + weight * multiplier
+            entry = (_ranked(scores), scores, 1.0, frozenset(scores))
+        self.tokens.put(token, entry)
+        return entry
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        """Позиции нейросетей в catalog.networks, отсортированные по релевантности.
+
+        Сначала карточки, где нашлось больше слов запроса, затем по весу.
+        """
+        postings = []
+        for token in list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_WORDS]:
+            entry = self.token_postings(token)
+            if entry:
+                postings.append(entry)
+        # От редких слов к частым: пересечение обходит меньшее множество
+        documents = sorted((entry[3] for entry in postings), key=len)
+
+        results = []
+        # Группы карточек с одинаковым числом найденных слов, начиная с полного совпадения
+        found_more = frozenset()
+        for hits in range(len(documents), 0, -1):
+            need = limit - len(results)
+            if need <= 0:
+                break
+            if hits == len(documents):
+                found = frozenset.intersection(*documents)
+            elif hits == 1:
+                found = frozenset().union(*documents)
+            else:
+                found = frozenset().union(*(
+                    frozenset.intersection(*words) for words in combinations(documents, hits)
+                ))
+            group = found - found_more
+            if len(group) > need:
+                results.extend(_top(postings, group, hits, need))
+                break
+            results.extend(sorted(group, key=lambda index: (-_score(postings, index), index)))
+            found_more = found
+        return results
+
+def _ranked(scores):
+    # По убыванию веса, при равном весе по позиции: сортировка устойчива
+    ranked = sorted(scores)
+    ranked.sort(key=scores.__getitem__, reverse=True)
+    return tuple(ranked)
+
+def _score(postings, index):
+    score = 0.0
+    for _, scores, multiplier, _ in postings:
+        weight = scores.get(index)
+        if weight is not None:
+            score += weight * multiplier
+    return score
+
+def _top(postings, group, hits, limit):
+    """Первые limit карточек группы по весу.
+
+    Списки слов запроса читаются сверху параллельно, пачками удваивающейся
+    длины. Непрочитанная карточка группы есть в списках ровно hits слов и в
+    каждом ниже прочитанного, поэтому ее вес не больше суммы hits наибольших
+    весов на следующих строках, а при равенстве ее позиция в каталоге не
+    меньше позиций на них.
+    """
+    best = []
+    seen = set()
+    depth = 0
+    step = max(TOP_FIRST_STEP, limit)
+    while len(seen) < len(group):
+        for ranked, _, _, _ in postings:
+            for index in ranked[depth:depth + step]:
+                if index not in seen and index in group:
+                    seen.add(index)
+                    candidate = (_score(postings, index), -index)
+                    if len(best) < limit:
+                        heapq.heappush(best, candidate)
+                    elif candidate > best[0]:
+                        heapq.heapreplace(best, candidate)
+        depth += step
+        step *= 2
+        if len(best) < limit:
+            continue
+
+        bounds = []
+        lowest = None
+        for ranked, scores, multiplier, _ in postings:
+            if depth < len(ranked):
+                index = ranked[depth]
+                bounds.append(scores[index] * multiplier)
+                if lowest is None or index < lowest:
+                    lowest = index
+        if lowest is None:
+            break
+        bounds.sort(reverse=True)
+        bound = sum(bounds[:hits])
+        score, negative_index = best[0]
+        if score > bound or (score == bound and -negative_index < lowest):
+            break
+
+    return [-negative_index for _, negative_index in sorted(best, reverse=True)]
+
+# Индекс строится вместе с каталогом и подменяется вместе с ним
+register_index("search", SearchIndex)
+
+def search_networks(query, limit=SEARCH_LIMIT):
+    """Ищет нейросети в текущем каталоге"""
+    catalog = get_catalog()
+    return [catalog.networks[index] for index in catalog.indexes["search"].search(query, limit)]
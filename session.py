@@ -0,0 +1,106 @@
+import asyncio
+import logging
+from urllib.parse import urlsplit
+from aiohttp import ClientSession, TraceConfig
+from aiohttp.hdrs import USER_AGENT
+from aiohttp.http import SERVER_SOFTWARE
+from aiogram import __version__ as aiogram_version
+from aiogram.client.session.aiohttp import AiohttpSession
+from metrics import API_POOL_WAIT
+import codec
+from config import (
+    API_POOL_SIZE, API_POOL_PER_HOST, API_KEEPALIVE, API_DNS_TTL, API_TIMEOUT, API_METHOD_TIMEOUTS
+)
+
+logger = logging.getLogger(__name__)
+
+# Не чаще раза в столько секунд предупреждаем о заполненном пуле
+SATURATION_LOG_INTERVAL = 60
+
+class PooledSession(AiohttpSession):
+    """Сессия Bot API с настраиваемым пулом соединений, таймаутами по методам,
+    прогревом соединений и JSON кодеком из JSON_CODEC.
+
+    Если запрос ждет свободного соединения, время ожидания попадает в метрику
+    bot_api_pool_wait_seconds, а в лог пишется предупреждение.
+    """
+
+    def __init__(self, limit=API_POOL_SIZE, limit_per_host=API_POOL_PER_HOST, keepalive=API_KEEPALIVE,
+                 dns_ttl=API_DNS_TTL, timeout=API_TIMEOUT, method_timeouts=API_METHOD_TIMEOUTS, **kwargs):
+        kwargs.setdefault("json_loads", codec.loads)
+        kwargs.setdefault("json_dumps", codec.dumps)
+        super().__init__(limit=limit, timeout=timeout, **kwargs)
+        self._connector_init.update(
+            limit_per_host=limit_per_host,
+            keepalive_timeout=keepalive,
+            ttl_dns_cache=dns_ttl,
+        )
+        self.method_timeouts = method_timeouts
+        self.pool_waits = 0
+        self._last_saturation_log = 0.0
+
+        self._trace = TraceConfig()
+        self._trace.on_connection_queued_start.append(self._on_queued_start)
+        self._trace.on_connection_queued_end.append(self._on_queued_end)
+
+    async def create_session(self):
+        if self._should_reset_connector:
+            await self.close()
+
+        if self._session is None or self._session.closed:
+            self._session = ClientSession(
+                connector=self._connector_type(**self._connector_init),
+                headers={USER_AGENT: f"{SERVER_SOFTWARE} aiogram/{aiogram_version}"},
+                trace_configs=[self._trace],
+            )
+            self._should_reset_connector = False
+
+        return self._session
+
+    async def make_request(self, bot, method, timeout=None):
+        if timeout is None:
+            timeout = self.method_timeouts.get(method.__api_method__)
+        return await super().make_request(bot, method, timeout=timeout)
+
+    @property
+    def connections_in_use(self):
+        """Сколько соединений пула сейчас занято запросами"""
+        if self._session is None or self._session.closed:
+            return 0
+        return len(getattr(self._session.connector, "_acquired", ()))
+
+    async def _on_queued_start(self, session, context, params):
+        context.queued_at = asyncio.get_running_loop().time()
+        context.in_use = self.connections_in_use
+
+    async def _on_queued_end(self, session, context, params):
+        now = asyncio.get_running_loop().time()
+        wait = now - context.queued_at
+        self.pool_waits += 1
+        API_POOL_WAIT.observe(wait)
+        if now - self._last_saturation_log > SATURATION_LOG_INTERVAL:
+            self._last_saturation_log = now
+            logger.warning(
+                f"🚰 Пул соединений Bot API заполнен ({context.in_use}/{self._connector_init['limit']}), "
+                f"запрос ждал соединения {wait * 1000:.0f} мс"
+            )
+
+    async def warm_up(self, connections):
+        """Заранее открывает соединения (TCP и TLS), чтобы первые запросы их не ждали"""
+        connections = min(connections, self._connector_init["limit"] or connections)
+        if connections <= 0:
+            return
+        session = await self.create_session()
+        parts = urlsplit(self.api.base)
+        url = f"{parts.scheme}://{parts.netloc}/"
+
+        async def touch():
+            async with session.get(url, allow_redirects=False, timeout=10) as response:
+                await response.read()
+
+        results = await asyncio.gather(*(touch() for _ in range(connections)), return_exceptions=True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            logger.warning(f"⚠️ Прогрев соединений с Bot API: {len(errors)} из {connections} не удалось: {errors[0]!r}")
+        else:
+            logger.info(f"🔥 Открыто соединений с Bot API: {connections}")
@@ -1,10 +1,32 @@
+import asyncio
 import logging
 from aiogram import Bot
 from aiogram.types import LabeledPrice, InlineKeyboardMarkup, InlineKeyboardButton
 from config import STARS_PACKAGES, AUTHOR_USER_ID
+from scheduler import outbound_priority, NOTIFICATION
+from ledger import record_payment
+from callbacks import encode, PACKAGE_IDS
 
 logger = logging.getLogger(__name__)
 
+# Попытки записать платеж в журнал (база может быть занята другим процессом);
+# пауза между попытками удваивается
+RECORD_ATTEMPTS = 3
+RECORD_RETRY_DELAY = 0.5
+
+async def _record_with_retry(payer_id, package_id, total_amount, charge_id):
+    """record_payment с повторами; исключение последней попытки пробрасывается"""
+    delay = RECORD_RETRY_DELAY
+    for attempt in range(1, RECORD_ATTEMPTS + 1):
+        try:
+            return await record_payment(payer_id, package_id, total_amount, charge_id)
+        except Exception as e:
+            if attempt == RECORD_ATTEMPTS:
+                raise
+            logger.warning(f"Не удалось записать платеж {charge_id} (попытка {attempt}): {e}, повторяем")
+            await asyncio.sleep(delay)
+            delay *= 2
+
 def get_support_keyboard():
     """Создает клавиатуру с вариантами поддержки проекта"""
     keyboard = InlineKeyboardMarkup(inline_keyboard=[])
@@ -17,13 +39,13 @@ def get_support_keyboard():
         keyboard.inline_keyboard.append([
             InlineKeyboardButton(
                 text=f"⭐ {title} ({stars_count} Stars)",
-                callback_data=f"support:{package_id}"
+                callback_data=encode("support_package", PACKAGE_IDS.index(package_id))
             )
         ])
     
     # Добавляем кнопку "Назад"
     keyboard.inline_keyboard.append([
-        InlineKeyboardButton(text="⬅️ Назад", callback_data="about")
+        InlineKeyboardButton(text="⬅️ Назад", callback_data=encode("about"))
     ])
     
     return keyboard
@@ -73,13 +95,13 @@ def get_payment_keyboard(invoice_link: str, package_id: str):
         [
             InlineKeyboardButton(
                 text="⬅️ Выбрать другой пакет",
-                callback_data="support"
+                callback_data=encode("support")
             )
         ],
         [
             InlineKeyboardButton(
                 text="🏠 Главное меню",
-                callback_data="main_menu"
+                callback_data=encode("main_menu")
             )
         ]
     ])
@@ -109,7 +131,8 @@ Telegram Stars - встроенная валюта Telegram для поддер
     
     return text
 
-async def handle_successful_payment(bot: Bot, user_id: int, payload: str, total_amount: int):
+async def handle_successful_payment(bot: Bot, user_id: int, payload: str, total_amount: int,
+                                    charge_id: str = None):
     """Обработчик успешного платежа"""
     try:
         # Парсим payload
@@ -121,6 +144,21 @@ async def handle_successful_payment(bot: Bot, user_id: int, payload: str, total_
             if package_id in STARS_PACKAGES:
                 package = STARS_PACKAGES[package_id]
                 
+                # Сначала фиксируем платеж в журнале; повторная доставка
+                # того же платежа не должна давать второе спасибо и двойной учет.
+                # Незаписанный платеж не подтверждаем: без записи нет защиты от повтора
+                try:
+                    recorded = await _record_with_retry(payer_id, package_id, total_amount, charge_id)
+                except Exception as e:
+                    logger.error(
+                        f"💥 Платеж не записан в журнал: charge_id={charge_id}, пользователь {payer_id}, "
+                        f"пакет {package_id}, {total_amount} Stars: {e}"
+                    )
+                    return False
+                if not recorded:
+                    logger.warning(f"Повторный платеж {charge_id} пропущен")
+                    return False
+                
                 # Отправляем благодарность пользователю
                 thank_you_text = f"""🙏 **Огромное спасибо за поддержку!**
 
@@ -153,11 +191,13 @@ async def handle_successful_payment(bot: Bot, user_id: int, payload: str, total_
 Время: {total_amount}"""
 
                     try:
-                        await bot.send_message(
-                            chat_id=AUTHOR_USER_ID,
-                            text=author_notification,
-                            parse_mode="Markdown"
-                        )
+                        # Уведомление автору пропускает вперед ответы пользователям
+                        with outbound_priority(NOTIFICATION):
+                            await bot.send_message(
+                                chat_id=AUTHOR_USER_ID,
+                                text=author_notification,
+                                parse_mode="Markdown"
+                            )
                     except Exception as e:
                         logger.error(f"Не удалось уведомить автора: {e}")
                 
@@ -169,18 +209,23 @@ async def handle_successful_payment(bot: Bot, user_id: int, payload: str, total_
     
     return False
 
-def get_stars_statistics_text(payments_count: int = 0, total_stars: int = 0):
+def get_stars_statistics_text(payments_count: int = 0, total_stars: int = 0,
+                              payers_count: int = 0, package_stats: dict = None):
     """Возвращает статистику по Stars для админ-панели"""
+    package_stats = package_stats or {}
+    
     text = f"""📊 **Статистика поддержки проекта**
 
 💫 **Всего получено Stars:** {total_stars}
-🤝 **Количество поддержавших:** {payments_count}
+🤝 **Количество поддержавших:** {payers_count}
+🧾 **Количество платежей:** {payments_count}
 💝 **Средний донат:** {total_stars // payments_count if payments_count > 0 else 0} Stars
 
 📈 **Доступные пакеты:**"""
     
     for package_id, package_data in STARS_PACKAGES.items():
-        text += f"\n• {package_data['title']}: {package_data['stars']} ⭐"
+        package_payments, package_stars = package_stats.get(package_id, (0, 0))
+        text += f"\n• {package_data['title']}: {package_data['stars']} ⭐ (покупок: {package_payments}, получено {package_stars} ⭐)"
     
     text += f"""
 
@@ -0,0 +1,223 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage
+from cache import TTLCache
+from db import connect, transaction
+from config import (
+    STATE_STORAGE, STATE_PATH, STATE_CACHE_SIZE, STATE_CACHE_TTL, STATE_TTL,
+    STATE_FLUSH_INTERVAL, STATE_FLUSH_BATCH
+)
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS states (
+    key TEXT PRIMARY KEY,
+    state TEXT,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS states_updated_at ON states (updated_at);
+"""
+
+# Как часто удалять из базы состояния старше STATE_TTL
+CLEANUP_INTERVAL = 3600
+
+# Запись хранилища: (состояние, данные)
+EMPTY = (None, {})
+
+def _state_name(state):
+    return state.state if isinstance(state, State) else state
+
+def _db_key(key):
+    return (
+        f"{key.bot_id}:{key.chat_id}:{key.user_id}:{key.thread_id or ''}:"
+        f"{key.business_connection_id or ''}:{key.destiny}"
+    )
+
+class MemoryStateStorage(BaseStorage):
+    """Состояния только в памяти: LRU с временем жизни вместо неограниченного словаря"""
+
+    def __init__(self, maxsize=STATE_CACHE_SIZE, ttl=STATE_TTL):
+        self.cache = TTLCache(maxsize, ttl)
+
+    async def _load(self, key):
+        return self.cache.get(key, EMPTY)
+
+    async def _store(self, key, record):
+        self.cache.put(key, record)
+
+    async def set_state(self, key, state=None):
+        _, data = await self._load(key)
+        await self._store(key, (_state_name(state), data))
+
+    async def get_state(self, key):
+        state, _ = await self._load(key)
+        return state
+
+    async def set_data(self, key, data):
+        state, _ = await self._load(key)
+        await self._store(key, (state, data.copy()))
+
+    async def get_data(self, key):
+        _, data = await self._load(key)
+        return data.copy()
+
+    def stats(self):
+        """Состояние кэша для мониторинга"""
+        return {
+            "cached": len(self.cache),
+            "hits": self.cache.hits,
+            "misses": self.cache.misses,
+        }
+
+    async def close(self):
+        self.cache.clear()
+
+class SQLiteStateStorage(MemoryStateStorage):
+    """Состояния в SQLite с кэшем в памяти и отложенной записью пачками.
+
+    Изменения сразу видны в своем процессе, а в базу попадают одной транзакцией
+    раз в flush_interval секунд или при накоплении flush_batch изменений.
+    Процессы пишут в общий файл (WAL); при конфликте остается более поздняя запись,
+    а чужие изменения процесс увидит после истечения cache_ttl.
+    """
+
+    def __init__(self, path=STATE_PATH, maxsize=STATE_CACHE_SIZE, cache_ttl=STATE_CACHE_TTL,
+                 ttl=STATE_TTL, flush_interval=STATE_FLUSH_INTERVAL, flush_batch=STATE_FLUSH_BATCH):
+        super().__init__(maxsize, cache_ttl)
+        self.path = path
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        # Изменения, еще не записанные в базу: ключ -> (запись, время изменения)
+        self._pending = {}
+        self._flushing = {}
+        self._connection = None
+        self._lock = threading.Lock()
+        self._wake = None
+        self._flusher = None
+        self._last_cleanup = 0.0
+        self.flushes = 0
+        self.written = 0
+
+    def _get_connection(self):
+        if self._connection is None:
+            # Соединение создается в том процессе, который с ним работает
+            self._connection = connect(self.path, SCHEMA)
+        return self._connection
+
+    def _read(self, db_key):
+        with self._lock:
+            row = self._get_connection().execute(
+                "SELECT state, data, updated_at FROM states WHERE key = ?", (db_key,)
+            ).fetchone()
+        if row is None or row[2] < time.time() - self.ttl:
+            return EMPTY
+        return row[0], json.loads(row[1])
+
+    def _unflushed(self, key):
+        entry = self._pending.get(key) or self._flushing.get(key)
+        return None if entry is None else entry[0]
+
+    async def _load(self, key):
+        record = self.cache.get(key)
+        if record is not None:
+            return record
+
+        record = self._unflushed(key)
+        if record is None:
+            record = await asyncio.to_thread(self._read, _db_key(key))
+            # Пока шло чтение, запись могла измениться в этом процессе
+            if key in self.cache:
+                return self.cache.get(key)
+            record = self._unflushed(key) or record
+
+        self.cache.put(key, record)
+        return record
+
+    async def _store(self, key, record):
+        self.cache.put(key, record)
+        self._pending[key] = (record, time.time())
+
+        if self._flusher is None or self._flusher.done():
+            self._wake = asyncio.Event()
+            self._flusher = asyncio.create_task(self._flush_loop(), name="state-flush")
+        if len(self._pending) >= self.flush_batch:
+            self._wake.set()
+
+    def _write(self, batch):
+        now = time.time()
+        rows = [
+            (_db_key(key), state, json.dumps(data, ensure_ascii=False), updated_at)
+            for key, ((state, data), updated_at) in batch.items()
+        ]
+        with self._lock, transaction(self._get_connection()) as connection:
+            connection.executemany(
+                "INSERT INTO states (key, state, data, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET state = excluded.state, data = excluded.data, "
+                "updated_at = excluded.updated_at WHERE excluded.updated_at >= states.updated_at",
+                rows
+            )
+            if now - self._last_cleanup > CLEANUP_INTERVAL:
+                connection.execute("DELETE FROM states WHERE updated_at < ?", (now - self.ttl,))
+                self._last_cleanup = now
+
+    async def flush(self):
+        """Записывает накопленные изменения одной транзакцией"""
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, {}
+        self._flushing = batch
+        try:
+            await asyncio.to_thread(self._write, batch)
+        except Exception as e:
+            logger.error(f"Ошибка записи состояний в {self.path}: {e}")
+            # Изменения не теряем; более свежие из нового буфера важнее
+            for key, entry in batch.items():
+                self._pending.setdefault(key, entry)
+            return
+        finally:
+            self._flushing = {}
+
+        self.flushes += 1
+        self.written += len(batch)
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    def stats(self):
+        stats = super().stats()
+        stats.update(pending=len(self._pending), flushes=self.flushes, written=self.written)
+        return stats
+
+    async def close(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self.flush()
+        if self._connection is not None:
+            with self._lock:
+                self._connection.close()
+                self._connection = None
+        await super().close()
+
+def create_storage():
+    """Хранилище состояний по настройке STATE_STORAGE"""
+    if STATE_STORAGE == "sqlite":
+        return SQLiteStateStorage()
+    if STATE_STORAGE != "memory":
+        logger.warning(f"⚠️ Неизвестный STATE_STORAGE={STATE_STORAGE}, используется memory")
+    return MemoryStateStorage()
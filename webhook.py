@@ -0,0 +1,152 @@
+import asyncio
+import logging
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+from aiohttp import web
+from config import WEBHOOK_WORKERS, WEBHOOK_QUEUE_SIZE
+
+logger = logging.getLogger(__name__)
+
+async def read_update(request, bot):
+    """Тело апдейта: байты сразу отдаются кодеку сессии, без декодирования в str"""
+    return bot.session.json_loads(await request.read())
+
+class WebhookRequestHandler(SimpleRequestHandler):
+    """SimpleRequestHandler, разбирающий тело webhook через read_update
+    и умеющий дождаться обработки принятых апдейтов при остановке.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._requests = set()
+
+    async def handle(self, request):
+        task = asyncio.current_task()
+        self._requests.add(task)
+        try:
+            return await super().handle(request)
+        finally:
+            self._requests.discard(task)
+
+    @property
+    def in_flight(self):
+        """Запросы webhook и апдейты, которые еще обрабатываются"""
+        return len(self._requests) + len(self._background_feed_update_tasks)
+
+    async def drain(self):
+        """Ждет, пока будут обработаны все принятые апдейты"""
+        while self._requests or self._background_feed_update_tasks:
+            await asyncio.wait(self._requests | self._background_feed_update_tasks)
+
+    async def abort(self):
+        """Отменяет необработанные апдейты, когда ждать больше нельзя"""
+        tasks = self._requests | self._background_feed_update_tasks
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _handle_request_background(self, bot, request):
+        feed_update_task = asyncio.create_task(
+            self._background_feed_update(bot=bot, update=await read_update(request, bot))
+        )
+        self._background_feed_update_tasks.add(feed_update_task)
+        feed_update_task.add_done_callback(self._background_feed_update_tasks.discard)
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def _handle_request(self, bot, request):
+        result = await self.dispatcher.feed_webhook_update(bot, await read_update(request, bot), **self.data)
+        return web.Response(body=self._build_response_writer(bot=bot, result=result))
+
+class QueuedRequestHandler(WebhookRequestHandler):
+    """Webhook: апдейт сразу подтверждается и кладется в ограниченную очередь,
+    которую разбирает фиксированное число воркеров.
+
+    Если очередь заполнена, Telegram получает 503 и повторит доставку позже.
+    """
+
+    def __init__(self, dispatcher, bot, workers=WEBHOOK_WORKERS,
+                 queue_size=WEBHOOK_QUEUE_SIZE, **kwargs):
+        super().__init__(dispatcher=dispatcher, bot=bot, handle_in_background=True, **kwargs)
+        self.workers = workers
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self._worker_tasks = []
+        # Счетчики для мониторинга
+        self.accepted = 0
+        self.rejected = 0
+        self.processed = 0
+        self.last_wait = 0.0
+        self.max_wait = 0.0
+
+    def register(self, app, /, path, **kwargs):
+        app.on_startup.append(self._start_workers)
+        super().register(app, path=path, **kwargs)
+
+    async def _start_workers(self, app):
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(), name=f"webhook-worker-{number}")
+            for number in range(self.workers)
+        ]
+        logger.info(f"👷 Запущено воркеров webhook: {self.workers}, очередь: {self.queue.maxsize}")
+
+    async def _handle_request_background(self, bot, request):
+        try:
+            update = await read_update(request, bot)
+        except ValueError:
+            return web.Response(status=400, text="Bad Request")
+
+        try:
+            self.queue.put_nowait((update, asyncio.get_running_loop().time()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            logger.warning(f"🚦 Очередь апдейтов заполнена ({self.queue.qsize()}), отвечаем 503")
+            return web.Response(status=503, text="Busy", headers={"Retry-After": "1"})
+
+        self.accepted += 1
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            update, enqueued_at = await self.queue.get()
+            wait = loop.time() - enqueued_at
+            self.last_wait = wait
+            self.max_wait = max(self.max_wait, wait)
+            try:
+                await self._background_feed_update(bot=self.bot, update=update)
+            except Exception as e:
+                logger.error(f"Ошибка обработки апдейта {update.get('update_id')}: {e}")
+            finally:
+                self.processed += 1
+                self.queue.task_done()
+
+    @property
+    def in_flight(self):
+        return super().in_flight + self.accepted - self.processed
+
+    async def drain(self):
+        await super().drain()
+        await self.queue.join()
+
+    async def abort(self):
+        await super().abort()
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+
+    def stats(self):
+        """Состояние очереди для мониторинга"""
+        return {
+            "queue_depth": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "workers": self.workers,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "processed": self.processed,
+            "last_wait_seconds": round(self.last_wait, 4),
+            "max_wait_seconds": round(self.max_wait, 4),
+        }
+
+    async def close(self):
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        await super().close()